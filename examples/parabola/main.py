@@ -1,6 +1,15 @@
 import numpy as np
 from msense.api import *
 
+# Use Numba to compile the discipline kernels, if available
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        def decorator(func):
+            return func
+        return decorator
+
 create_logger()
 
 x1 = Variable("x1", lb=2, ub=100)
@@ -8,17 +17,37 @@ x2 = Variable("x2", lb=3, ub=90)
 y = Variable("y")
 
 
+@njit(cache=True, fastmath=True)
+def _parabola_eval(x1, x2):
+    return x1**2 + x2**2
+
+
+@njit(cache=True, fastmath=True)
+def _parabola_diff(x1, x2):
+    return 2 * x1, 2 * x2
+
+
 class Parabola(Discipline):
+    vectorized = True
+
     def __init__(self):
         super().__init__("Parabola", [x1, x2], [y],
                          cache_policy=CachePolicy.FULL)
 
     def _eval(self) -> None:
+        self._values["y"] = _parabola_eval(self._values["x1"][0],
+                                           self._values["x2"][0])
+
+    def _eval_batch(self) -> None:
+        # Vectorized over the sample axis
         self._values["y"] = self._values["x1"]**2 + self._values["x2"]**2
 
     def _differentiate(self) -> None:
-        self._jac["y"] = {"x1": 2 * self._values["x1"],
-                          "x2": 2 * self._values["x2"]}
+        dx1, dx2 = _parabola_diff(self._values["x1"][0],
+                                  self._values["x2"][0])
+        jac_y = self._jac["y"]
+        jac_y["x1"][:] = dx1
+        jac_y["x2"][:] = dx2
 
 
 parabola = Parabola()
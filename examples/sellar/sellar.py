@@ -1,8 +1,63 @@
 from msense.api import *
 import numpy as np
 
+# Use Numba to compile the discipline kernels, if available.
+# * The kernels use numpy functions, so that nan/inf are produced (not exceptions raised) either way
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        def decorator(func):
+            return func
+        return decorator
+
+
+@njit(cache=True)
+def _sellar1_eval(z1, z2, x1, y2):
+    y1 = np.sqrt(z1**2 + z2 + x1 - 0.2 * y2)
+    g1 = 3.16 - y1**2
+    return y1, g1
+
+
+@njit(cache=True)
+def _sellar1_diff(z1, y1):
+    dy1_dz1 = z1 / y1
+    dy1_dz2 = 1 / (2 * y1)
+    dy1_dx1 = 1 / (2 * y1)
+    dy1_dy2 = -0.2 / (2 * y1)
+    return dy1_dz1, dy1_dz2, dy1_dx1, dy1_dy2
+
+
+@njit(cache=True)
+def _sellar2_eval(z1, z2, y1):
+    y2 = abs(y1) + z1 + z2
+    g2 = y2 - 24
+    return y2, g2
+
+
+@njit(cache=True)
+def _sellar2_diff(y1):
+    # Sign of y1
+    if y1 > 0:
+        return 1.0
+    if y1 < 0:
+        return -1.0
+    return 0.0
+
+
+@njit(cache=True)
+def _objective_eval(x1, z2, y1, y2):
+    return x1**2 + z2 + y1**2 + np.exp(-y2)
+
+
+@njit(cache=True)
+def _objective_diff(x1, y1, y2):
+    return 2 * x1, 1.0, 2 * y1, -np.exp(-y2)
+
 
 class SellarDiscipline1(Discipline):
+    vectorized = True
+
     def __init__(self, z1: Variable, z2: Variable,
                  x1: Variable, y2: Variable,
                  y1: Variable, g1: Variable):
@@ -20,31 +75,40 @@ class SellarDiscipline1(Discipline):
         _y2 = self._values["y2"]
 
         # Compute y1 and g1
-        self._values["y1"] = np.sqrt(_z1**2 + _z2 + _x1 - 0.2 * _y2)
-        self._values["g1"] = 3.16 - self._values["y1"]**2
+        self._values["y1"], self._values["g1"] = _sellar1_eval(
+            _z1[0], _z2[0], _x1[0], _y2[0])
+
+    def _eval_batch(self) -> None:
+        # Vectorized over the sample axis
+        v = self._values
+        v["y1"] = np.sqrt(v["z1"]**2 + v["z2"] + v["x1"] - 0.2 * v["y2"])
+        v["g1"] = 3.16 - v["y1"]**2
 
     def _differentiate(self) -> None:
         # Get the input variable values
         _z1 = self._values["z1"]
-        _z2 = self._values["z2"]
-        _x1 = self._values["x1"]
-        _y2 = self._values["y2"]
         _y1 = self._values["y1"]
 
         # Compute the derivatives of y1
-        self._jac["y1"] = {"z1": _z1/_y1,
-                           "z2": 1 / (2*_y1),
-                           "x1": 1/(2*_y1),
-                           "y2": -0.2/(2*_y1)}
-
-        # Compute the derivatives of y1
-        self._jac["g1"] = {"z1": -2*_y1*self._jac["y1"]["z1"],
-                           "z2": -2*_y1*self._jac["y1"]["z2"],
-                           "x1": -2*_y1*self._jac["y1"]["x1"],
-                           "y2": -2*_y1*self._jac["y1"]["y2"]}
+        dz1, dz2, dx1, dy2 = _sellar1_diff(_z1[0], _y1[0])
+        jac_y1 = self._jac["y1"]
+        jac_y1["z1"][:] = dz1
+        jac_y1["z2"][:] = dz2
+        jac_y1["x1"][:] = dx1
+        jac_y1["y2"][:] = dy2
+
+        # Compute the derivatives of g1
+        dg1_dy1 = -2*_y1[0]
+        jac_g1 = self._jac["g1"]
+        jac_g1["z1"][:] = dg1_dy1*dz1
+        jac_g1["z2"][:] = dg1_dy1*dz2
+        jac_g1["x1"][:] = dg1_dy1*dx1
+        jac_g1["y2"][:] = dg1_dy1*dy2
 
 
 class SellarDiscipline2(Discipline):
+    vectorized = True
+
     def __init__(self, z1: Variable, z2: Variable,
                  y1: Variable, y2: Variable,
                  g2: Variable):
@@ -61,21 +125,31 @@ class SellarDiscipline2(Discipline):
         _y1 = self._values["y1"]
 
         # Compute y2 and g2
-        self._values["y2"] = np.abs(_y1) + _z1 + _z2
-        self._values["g2"] = self._values["y2"] - 24
+        self._values["y2"], self._values["g2"] = _sellar2_eval(
+            _z1[0], _z2[0], _y1[0])
+
+    def _eval_batch(self) -> None:
+        # Vectorized over the sample axis
+        v = self._values
+        v["y2"] = np.abs(v["y1"]) + v["z1"] + v["z2"]
+        v["g2"] = v["y2"] - 24
 
     def _differentiate(self) -> None:
         # Get the input variable values
-        _z1 = self._values["z1"]
-        _z2 = self._values["z2"]
         _y1 = self._values["y1"]
 
         # Compute the derivatives of y2 and g2
-        self._jac["y2"] = {"y1": np.sign(_y1), "z1": 1.0, "z2": 1.0}
-        self._jac["g2"] = {"y1": np.sign(_y1), "z1": 1.0, "z2": 1.0}
+        sign_y1 = _sellar2_diff(_y1[0])
+        for out_name in ("y2", "g2"):
+            jac_out = self._jac[out_name]
+            jac_out["y1"][:] = sign_y1
+            jac_out["z1"][:] = 1.0
+            jac_out["z2"][:] = 1.0
 
 
 class SellarObjective(Discipline):
+    vectorized = True
+
     def __init__(self, x1: Variable, z2: Variable,
                  y1: Variable, y2: Variable,
                  f: Variable):
@@ -91,20 +165,26 @@ class SellarObjective(Discipline):
         _y2 = self._values["y2"]
 
         # Compute f
-        self._values["f"] = _x1**2 + _z2 + _y1**2 + np.exp(-_y2)
+        self._values["f"] = _objective_eval(_x1[0], _z2[0], _y1[0], _y2[0])
+
+    def _eval_batch(self) -> None:
+        # Vectorized over the sample axis
+        v = self._values
+        v["f"] = v["x1"]**2 + v["z2"] + v["y1"]**2 + np.exp(-v["y2"])
 
     def _differentiate(self) -> None:
         # Get the input variable values
         _x1 = self._values["x1"]
-        _z2 = self._values["z2"]
         _y1 = self._values["y1"]
         _y2 = self._values["y2"]
 
         # Compute the derivatives of f
-        self._jac["f"]["x1"] = 2*_x1
-        self._jac["f"]["z2"] = 1.0
-        self._jac["f"]["y1"] = 2 * _y1
-        self._jac["f"]["y2"] = -np.exp(-_y2)
+        dx1, dz2, dy1, dy2 = _objective_diff(_x1[0], _y1[0], _y2[0])
+        jac_f = self._jac["f"]
+        jac_f["x1"][:] = dx1
+        jac_f["z2"][:] = dz2
+        jac_f["y1"][:] = dy1
+        jac_f["y2"][:] = dy2
 
 
 # Design variables
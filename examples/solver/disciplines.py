@@ -3,9 +3,9 @@ from msense.api import *
 
 
 def func1(input_vars):
-    x1 = input_vars["x1"][0]
-    z = input_vars["z"][0]
-    y12 = input_vars["y12"][0]
+    x1 = input_vars["x1"][..., 0]
+    z = input_vars["z"][..., 0]
+    y12 = input_vars["y12"][..., 0]
     y21 = x1**2 + x1*z - y12 * z
     return {"y21": y21}
 
@@ -25,11 +25,11 @@ def dfunc1(input_vars):
 
 
 def func2(input_vars):
-    x2 = input_vars["x2"][0]
-    z = input_vars["z"][0]
-    y21 = input_vars["y21"][0]
+    x2 = input_vars["x2"][..., 0]
+    z = input_vars["z"][..., 0]
+    y21 = input_vars["y21"][..., 0]
     y12 = 2*y21 - x2**2 + z*x2
-    return {"y12": np.array([y12])}
+    return {"y12": np.atleast_1d(y12)}
 
 
 def dfunc2(input_vars):
@@ -45,6 +45,8 @@ def dfunc2(input_vars):
 
 
 class SimpleDisc(Discipline):
+    vectorized = True
+
     def __init__(self, name, input_vars, output_vars, func, dfunc):
         self.func = func
         self.dfunc = dfunc
@@ -54,5 +56,8 @@ class SimpleDisc(Discipline):
     def _eval(self) -> None:
         self._values.update(self.func(self._values))
 
+    def _eval_batch(self) -> None:
+        self._values.update(self.func(self._values))
+
     def _differentiate(self) -> None:
         self._jac.update(self.dfunc(self._values))
@@ -33,10 +33,32 @@ from msense.opt.problems.factory import create_opt_problem
 
 # Drivers
 from msense.opt.drivers.driver import Driver
-from msense.opt.drivers.scipy_driver import ScipyDriver
-from msense.opt.drivers.ipopt_driver import IpoptDriver
 from msense.opt.drivers.factory import DriverType
 from msense.opt.drivers.factory import create_driver
 
 # Logger
 from msense.utils.logging import create_logger
+
+# Names exported by "from msense.api import *"
+# * The lazily imported names are listed too, since a star import
+# does not consult the module __getattr__ otherwise
+__all__ = ["FLOAT_DTYPE", "COMPLEX_DTYPE", "Variable", "Discipline",
+           "Cache", "CachePolicy", "MemoryCache", "CacheType", "create_cache",
+           "JacobianAssembler",
+           "Solver", "NonlinearJacobi", "NonlinearGS", "NewtonRaphson", "SolverType", "create_solver",
+           "OptProblem", "SingleDiscipline", "MDF", "IDF", "CO", "OptProblemType", "create_opt_problem",
+           "Driver", "DriverType", "create_driver", "ScipyDriver", "IpoptDriver",
+           "create_logger"]
+
+# Modules imported on first access, since they pull in heavy dependencies
+_LAZY_IMPORTS = {"ScipyDriver": "msense.opt.drivers.scipy_driver",
+                 "IpoptDriver": "msense.opt.drivers.ipopt_driver"}
+
+
+def __getattr__(name: str):
+    if name in _LAZY_IMPORTS:
+        from importlib import import_module
+        value = getattr(import_module(_LAZY_IMPORTS[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -73,12 +73,14 @@ class Cache(ABC):
         ...
 
     @abstractmethod
-    def load_entry(self, input_values: Dict[str, ndarray]):
+    def load_entry(self, input_values: Dict[str, ndarray], copy: bool = None):
         """        
         Load the entry for the given inputs, if it exists.
 
         Args:
             inputs (Dict[str, ndarray]): Values for each input variable.
+            copy (bool, optional): Whether to return copies of the stored values. If False, read-only views
+            may be returned instead, when the caller does not modify them. Defaults to None (cache specific).
         """
         ...
 
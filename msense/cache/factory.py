@@ -17,7 +17,8 @@ def create_cache(input_vars: List[Variable],
                  type: CacheType = CacheType.MEMORY,
                  policy: CachePolicy = CachePolicy.LATEST,
                  tol: float = 1e-9,
-                 path: str = None) -> Cache:
+                 path: str = None,
+                 share_arrays: bool = True) -> Cache:
 
     kwargs = {"input_vars": input_vars,
               "output_vars": output_vars,
@@ -33,4 +34,4 @@ def create_cache(input_vars: List[Variable],
     type = CacheType(type)
 
     if type == CacheType.MEMORY:
-        return MemoryCache(**kwargs)
+        return MemoryCache(share_arrays=share_arrays, **kwargs)
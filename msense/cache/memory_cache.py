@@ -1,13 +1,21 @@
-from typing import Dict
+from typing import Dict, List
 from os.path import exists, splitext
 from logging import getLogger
 
-from numpy import ndarray
+from numpy import ndarray, concatenate, atleast_1d
+from numpy import zeros, flatnonzero, result_type
+from numpy import load, savez
 import json
 
-from msense.utils.array_and_dict_utils import check_values_match
+from msense.core.constants import FLOAT_DTYPE
+from msense.core.variable import Variable
+from msense.utils.array_and_dict_utils import check_arrays_match
+from msense.utils.array_and_dict_utils import get_variable_list_size, get_variable_list_offsets
 from msense.utils.array_and_dict_utils import copy_dict_1d, copy_dict_2d
+from msense.utils.array_and_dict_utils import view_dict_1d, view_dict_2d
 from msense.utils.array_and_dict_utils import verify_dict_1d, verify_dict_2d
+from msense.utils.array_and_dict_utils import array_to_dict_1d, dict_to_array_1d
+from msense.utils.array_and_dict_utils import array_to_dict_2d, dict_to_array_2d
 from msense.cache.cache import Cache, CachePolicy
 
 logger = getLogger(__name__)
@@ -16,14 +24,26 @@ logger = getLogger(__name__)
 class MemoryCache(Cache):
     """
     A cache stored entirely in memory. 
-    Can be saved as a json file, and loaded at runtime.
+    Can be saved as a json (default) or npz file, and loaded at runtime.
+    The file format is selected by the extension of the path.
     """
 
-    def __init__(self, **kwargs) -> None:
-        # Ensure that the filename has a .json extension
+    def __init__(self, share_arrays: bool = True, **kwargs) -> None:
+        """
+        Initialize the cache.
+
+        Args:
+            share_arrays (bool, optional): Whether to store and return read-only views of the
+            given arrays, instead of copies. The caller must not modify arrays passed to the cache in-place.
+            Defaults to True.
+        """
+        self.share_arrays = share_arrays
+
+        # Ensure that the filename has a .json or .npz extension
+        # If no valid extension is provided, .json is used
         if kwargs["path"] is not None:
             path, ext = splitext(kwargs["path"])
-            if ext != ".json":
+            if ext not in (".json", ".npz"):
                 kwargs["path"] = path + ".json"
 
         # Entries is a list of dictionaries
@@ -31,49 +51,138 @@ class MemoryCache(Cache):
         # entry in the cache
         self._entries = []
 
+        # Index mapping the exact bytes of the inputs
+        # to the position of the latest matching entry
+        self._exact_index: Dict[bytes, int] = {}
+
         super().__init__(**kwargs)
 
-    def check_if_entry_exists(self, input_values: Dict[str, ndarray]):
-        for entry in reversed(self._entries):
-            if check_values_match(self.input_vars, entry["inputs"],
-                                  input_values, self.tol):
-                return entry
+        # Offsets of the input variables in the
+        # contiguous input vector of each entry
+        self._offsets = get_variable_list_offsets(self.input_vars)
+
+        # The input vectors of the entries, stacked row-wise
+        # The i-th row corresponds to the i-th entry, any rows
+        # after the last entry are spare capacity
+        self._input_matrix = zeros(
+            (1, get_variable_list_size(self.input_vars)), FLOAT_DTYPE)
+
+    def _get_input_vec(self, input_values: Dict[str, ndarray]) -> ndarray:
+        """
+        Concatenate the input values into a contiguous vector.
+        """
+        return concatenate([atleast_1d(input_values[var.name]) for var in self.input_vars])
+
+    def _set_input_vec(self, entry_idx: int, input_vec: ndarray) -> None:
+        """
+        Store the input vector of an entry in the input matrix.
+        The capacity of the matrix is doubled when it is full.
+        """
+        n_rows = self._input_matrix.shape[0]
+        dtype = result_type(self._input_matrix, input_vec)
+        if entry_idx >= n_rows or dtype != self._input_matrix.dtype:
+            input_matrix = zeros(
+                (max(2 * n_rows, entry_idx + 1), self._input_matrix.shape[1]), dtype)
+            input_matrix[:n_rows] = self._input_matrix
+            self._input_matrix = input_matrix
+        self._input_matrix[entry_idx] = input_vec
+
+    def _rebuild_index(self) -> None:
+        """
+        Rebuild the input matrix and the exact index from the current entries.
+        """
+        self._exact_index = {}
+        for entry_idx, entry in enumerate(self._entries):
+            input_vec = self._get_input_vec(entry["inputs"])
+            self._set_input_vec(entry_idx, input_vec)
+            self._exact_index[input_vec.tobytes()] = entry_idx
+
+    def _find_entry(self, input_vec: ndarray):
+        """
+        Search the entries for a match. Later entries take precedence.
+        * Inputs identical to those of an entry match with a single dictionary lookup.
+        * Otherwise, all entries are compared at once, in a single vectorized pass over the input matrix.
+        The tolerance is relative to the norm of each variable, thus inputs within tolerance
+        cannot be located by hashing a fixed quantization grid.
+        """
+        entry_idx = self._exact_index.get(input_vec.tobytes())
+        if entry_idx is not None:
+            return self._entries[entry_idx]
+
+        n_entries = len(self._entries)
+        if n_entries > 0:
+            matches = flatnonzero(check_arrays_match(
+                self._offsets, self._input_matrix[:n_entries], input_vec, self.tol))
+            if matches.size > 0:
+                return self._entries[matches[-1]]
         return None
 
+    def _copy_dict_1d(self, vars: List[Variable], values: Dict[str, ndarray]) -> Dict[str, ndarray]:
+        """
+        Copy a dictionary of values, or create read-only views if arrays are shared.
+        """
+        if self.share_arrays:
+            return view_dict_1d(vars, values)
+        return copy_dict_1d(vars, values)
+
+    def _copy_dict_2d(self, input_vars: List[Variable], output_vars: List[Variable],
+                      values: Dict[str, Dict[str, ndarray]]) -> Dict[str, Dict[str, ndarray]]:
+        """
+        Copy a jacobian dictionary, or create read-only views if arrays are shared.
+        """
+        if self.share_arrays:
+            return view_dict_2d(input_vars, output_vars, values)
+        return copy_dict_2d(input_vars, output_vars, values)
+
+    def check_if_entry_exists(self, input_values: Dict[str, ndarray]):
+        return self._find_entry(self._get_input_vec(input_values))
+
     def add_entry(self, input_values: Dict[str, ndarray],
                   output_values: Dict[str, ndarray] = None,
                   jac: Dict[str, Dict[str, ndarray]] = None) -> None:
         # Check if an entry exists for the given inputs
-        entry = self.check_if_entry_exists(input_values)
+        input_vec = self._get_input_vec(input_values)
+        entry = self._find_entry(input_vec)
 
         # If the entry does not exist, create a new one
         entry_exists = True
         if entry is None:
-            entry = {"inputs": copy_dict_1d(self.input_vars, input_values),
+            entry = {"inputs": self._copy_dict_1d(self.input_vars, input_values),
                      "outputs": {},
                      "jac": {}}
             entry_exists = False
 
         if output_values is not None:
-            entry["outputs"] = copy_dict_1d(self.output_vars, output_values)
+            entry["outputs"] = self._copy_dict_1d(
+                self.output_vars, output_values)
 
         if jac is not None:
-            entry["jac"] = copy_dict_2d(
+            entry["jac"] = self._copy_dict_2d(
                 self.dinput_vars, self.doutput_vars, jac)
 
         if self.policy == CachePolicy.FULL and entry_exists is False:
             self._entries.append(entry)
+            self._set_input_vec(len(self._entries) - 1, input_vec)
+            self._exact_index[input_vec.tobytes()] = len(self._entries) - 1
 
-        if self.policy == CachePolicy.LATEST:
+        if self.policy == CachePolicy.LATEST and entry_exists is False:
             self._entries = [entry]
+            self._set_input_vec(0, input_vec)
+            self._exact_index = {input_vec.tobytes(): 0}
 
-    def load_entry(self, input_values: Dict[str, ndarray]):
+    def load_entry(self, input_values: Dict[str, ndarray], copy: bool = None):
         entry = self.check_if_entry_exists(input_values)
-        if entry is not None:
+        if entry is None:
+            return None, None
+
+        # By default, copies are returned unless the arrays are shared
+        if copy is None:
+            copy = not self.share_arrays
+        if copy:
             return copy_dict_1d(self.output_vars, entry["outputs"]), \
                 copy_dict_2d(self.dinput_vars, self.doutput_vars, entry["jac"])
-        else:
-            return None, None
+        return view_dict_1d(self.output_vars, entry["outputs"]), \
+            view_dict_2d(self.dinput_vars, self.doutput_vars, entry["jac"])
 
     def from_file(self):
         if not exists(self.path):
@@ -81,6 +190,104 @@ class MemoryCache(Cache):
                 f"MemoryCache cannot be loaded from file. File: {self.path} does not exist.")
             return
 
+        if splitext(self.path)[1] == ".json":
+            self._from_json()
+        else:
+            self._from_npz()
+
+        if self.policy == CachePolicy.LATEST and self._entries:
+            self._entries = [self._entries[-1]]
+
+        self._rebuild_index()
+
+    def to_file(self):
+        if splitext(self.path)[1] == ".json":
+            self._to_json()
+        else:
+            self._to_npz()
+
+    def _from_npz(self) -> None:
+        """
+        Load the cache entries from a npz file.
+        """
+        with load(self.path) as data:
+            inputs, outputs, jac = data["inputs"], data["outputs"], data["jac"]
+            has_outputs, has_jac = data["has_outputs"], data["has_jac"]
+
+        # Check that the stored arrays match the cache variables
+        n_inputs = get_variable_list_size(self.input_vars)
+        n_outputs = get_variable_list_size(self.output_vars)
+        n_dinputs = get_variable_list_size(self.dinput_vars)
+        n_doutputs = get_variable_list_size(self.doutput_vars)
+        if inputs.shape[1:] != (n_inputs,) or outputs.shape[1:] != (n_outputs,) \
+                or jac.shape[1:] != (n_doutputs, n_dinputs):
+            logger.error(
+                f"MemoryCache cannot be loaded from file. File: {self.path} does not match the cache variables.")
+            return
+
+        self._entries = []
+        for entry_idx in range(inputs.shape[0]):
+            entry = {"inputs": array_to_dict_1d(self.input_vars, inputs[entry_idx]),
+                     "outputs": {},
+                     "jac": {}}
+
+            # Load output values, if they exist
+            if has_outputs[entry_idx]:
+                entry["outputs"] = array_to_dict_1d(
+                    self.output_vars, outputs[entry_idx])
+
+            # Load jacobian, if it exists
+            if has_jac[entry_idx]:
+                entry["jac"] = array_to_dict_2d(
+                    self.dinput_vars, self.doutput_vars, jac[entry_idx])
+
+            # Add the entry
+            self._entries.append(entry)
+
+    def _to_npz(self) -> None:
+        """
+        Save the cache entries to a npz file.
+        The inputs, outputs and jacobians of all entries are
+        stacked into one array each.
+        """
+        n_entries = len(self._entries)
+        n_inputs = get_variable_list_size(self.input_vars)
+        n_outputs = get_variable_list_size(self.output_vars)
+        n_dinputs = get_variable_list_size(self.dinput_vars)
+        n_doutputs = get_variable_list_size(self.doutput_vars)
+
+        inputs = zeros((n_entries, n_inputs), FLOAT_DTYPE)
+        outputs = zeros((n_entries, n_outputs), FLOAT_DTYPE)
+        jac = zeros((n_entries, n_doutputs, n_dinputs), FLOAT_DTYPE)
+        has_outputs = zeros(n_entries, bool)
+        has_jac = zeros(n_entries, bool)
+
+        for entry_idx, entry in enumerate(self._entries):
+            # Write input values
+            inputs[entry_idx] = dict_to_array_1d(
+                self.input_vars, entry["inputs"])
+
+            # Write output, if they exist
+            if entry["outputs"]:
+                outputs[entry_idx] = dict_to_array_1d(
+                    self.output_vars, entry["outputs"])
+                has_outputs[entry_idx] = True
+
+            # Write jacobian, if it exists
+            if entry["jac"]:
+                jac[entry_idx] = dict_to_array_2d(
+                    self.dinput_vars, self.doutput_vars, entry["jac"])
+                has_jac[entry_idx] = True
+
+        # Open the file directly, so that numpy does not append a second extension
+        with open(self.path, "wb") as file:
+            savez(file, inputs=inputs, outputs=outputs, jac=jac,
+                  has_outputs=has_outputs, has_jac=has_jac)
+
+    def _from_json(self) -> None:
+        """
+        Load the cache entries from a json file.
+        """
         with open(self.path, "r") as file:
             # Load the json object
             json_obj = json.load(file)
@@ -104,10 +311,10 @@ class MemoryCache(Cache):
                 # Add the entry
                 self._entries.append(entry)
 
-        if self.policy == CachePolicy.LATEST:
-            self._entries = [self._entries[-1]]
-
-    def to_file(self):
+    def _to_json(self) -> None:
+        """
+        Save the cache entries to a json file.
+        """
         # Convert the list of entries to dictionary
         entry_dict = {}
         for entry_idx, entry in enumerate(self._entries):
@@ -133,8 +340,6 @@ class MemoryCache(Cache):
                         entry_dict[entry_idx]["jac"][out_var.name][in_var.name] = entry["jac"][out_var.name][in_var.name].tolist(
                         )
 
-        # Create a json object from the entry dictionary
-        # and save the object to file
-        json_obj = json.dumps(entry_dict, indent=4)
+        # Save the entry dictionary to file as compact json
         with open(self.path, "w") as file:
-            file.write(json_obj)
+            json.dump(entry_dict, file, separators=(",", ":"))
@@ -1,9 +1,14 @@
 from typing import Dict
 from typing import List
+from typing import Tuple
 from enum import Enum
+from copy import copy
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import pickle
 import logging
 
-from numpy import ndarray
+from numpy import ndarray, asarray, tile, zeros, atleast_1d
 
 from msense.core.constants import FLOAT_DTYPE, COMPLEX_DTYPE
 from msense.core.variable import Variable
@@ -11,7 +16,11 @@ from msense.cache.cache import CachePolicy
 from msense.cache.factory import CacheType, create_cache
 from msense.utils.array_and_dict_utils import verify_dict_1d, verify_dict_2d
 from msense.utils.array_and_dict_utils import copy_dict_1d, copy_dict_2d
+from msense.utils.array_and_dict_utils import get_variable_list_size
+from msense.utils.array_and_dict_utils import array_to_dict_2d, dict_to_array_2d
 from msense.utils.jac_utils import finite_difference_approx, complex_step_approx
+from msense.utils.jac_utils import finite_difference_approx_batch, complex_step_approx_batch
+from msense.utils.jac_utils import finite_difference_approx_parallel
 from msense.utils.jac_utils import initialize_dense_jac
 
 logger = logging.getLogger(__name__)
@@ -36,6 +45,19 @@ class Discipline:
         ALWAYS = True
         NEVER = False
 
+    # Whether _eval_batch is vectorized over the sample axis
+    # If so, the jacobian approximation evaluates all perturbations at once
+    vectorized: bool = False
+
+    # Whether the finite-difference perturbations are evaluated concurrently, using a process pool
+    # Each perturbation is evaluated by a deep copy of the discipline, thus the discipline must be picklable
+    # Only beneficial if _eval is expensive, since the discipline is sent to the worker processes
+    parallel_fd: bool = False
+
+    # Maximum number of worker processes for the parallel finite-difference approximation
+    # If None, the number of processors of the machine is used
+    n_fd_workers: int = None
+
     def __init__(self, name: str, input_vars: List[Variable], output_vars: List[Variable],
                  dinput_vars: List[Variable] = None, doutput_vars: List[Variable] = None,
                  cache_type: CacheType = CacheType.MEMORY, cache_policy: CachePolicy = CachePolicy.LATEST,
@@ -71,6 +93,9 @@ class Discipline:
                                   self.dinput_vars, self.doutput_vars,
                                   cache_type, cache_policy, cache_tol, cache_path)
 
+        # Total size of the input variables
+        self._n_inputs: int = get_variable_list_size(self.input_vars)
+
         # Number of evaluations and differentiations
         self.n_eval, self.n_diff = 0, 0
 
@@ -85,8 +110,23 @@ class Discipline:
         # Latest evaluation values
         self._values: Dict[str, ndarray] = {}
 
-        # Latest jacobian
+        # Contiguous array of the latest input values
+        self._input_arr: ndarray = None
+
+        # Input bytes and output values of the latest evaluation
+        self._last_eval: Tuple[bytes, Dict[str, ndarray]] = (None, {})
+
+        # Jacobian loaded from the cache during the latest evaluation
+        # None if the cache was not searched
+        self._loaded_jac: Dict[str, Dict[str, ndarray]] = None
+
+        # Latest jacobian, and the contiguous array holding it
         self._jac: Dict[str, Dict[str, ndarray]] = {}
+        self._jac_arr: ndarray = None
+
+        # Preallocated jacobian blocks, reused by each differentiation
+        self._jac_blocks: Dict[str, Dict[str, ndarray]] = initialize_dense_jac(
+            self.dinput_vars, self.doutput_vars)
 
         # Whether the disciplone is undergoing jacobian approximation
         self._approximating_jac: bool = False
@@ -97,17 +137,23 @@ class Discipline:
     def __repr__(self) -> str:
         return self.name
 
-    def get_input_values(self) -> Dict[str, ndarray]:
+    def get_input_values(self, copy: bool = True) -> Dict[str, ndarray]:
         """
         Get a copy of the current input values.
+        If copy is False, the arrays themselves are returned, and must not be modified.
         """
-        return copy_dict_1d(self.input_vars, self._values)
+        if copy:
+            return copy_dict_1d(self.input_vars, self._values)
+        return {var.name: self._values[var.name] for var in self.input_vars if var.name in self._values}
 
-    def get_output_values(self) -> Dict[str, ndarray]:
+    def get_output_values(self, copy: bool = True) -> Dict[str, ndarray]:
         """
         Get a copy of the current output values.
+        If copy is False, the arrays themselves are returned, and must not be modified.
         """
-        return copy_dict_1d(self.output_vars, self._values)
+        if copy:
+            return copy_dict_1d(self.output_vars, self._values)
+        return {var.name: self._values[var.name] for var in self.output_vars if var.name in self._values}
 
     def get_values(self) -> Dict[str, ndarray]:
         """
@@ -133,20 +179,34 @@ class Discipline:
     def get_jac(self) -> Dict[str, Dict[str, ndarray]]:
         """
         Get a copy of the current jacobian.
+        * The blocks are views into a single copied array.
+        """
+        if self._jac_arr is None:
+            return copy_dict_2d(self.dinput_vars, self.doutput_vars, self._jac)
+        return array_to_dict_2d(self.dinput_vars, self.doutput_vars, self._jac_arr.copy())
+
+    def get_jac_array(self) -> ndarray:
+        """
+        Get a copy of the current jacobian, as a dense (n_doutputs, n_dinputs) array.
         """
-        return copy_dict_2d(self.dinput_vars, self.doutput_vars, self._jac)
+        if self._jac_arr is None:
+            return dict_to_array_2d(self.dinput_vars, self.doutput_vars, self._jac)
+        return self._jac_arr.copy()
 
     def _load_cache_entry_outputs(self) -> bool:
         """
         Check if a cache entry exists for the current input values.
         If yes, update the output values.
+        * The jacobian of the entry is kept, so that differentiate() does not search the cache again.
 
         Returns:
             bool: Whether an entry was found.
         """
         entry_exists = False
         if self.cache is not None:
-            output_values, _ = self.cache.load_entry(self._values)
+            output_values, jac = self.cache.load_entry(
+                self._values, copy=False)
+            self._loaded_jac = jac if jac else {}
             if output_values:
                 self._values.update(output_values)
                 entry_exists = True
@@ -169,7 +229,11 @@ class Discipline:
         """
         entry_exists = False
         if self.cache is not None:
-            _, jac = self.cache.load_entry(self._values)
+            # Use the jacobian found by the latest evaluation, if any
+            if self._loaded_jac is not None:
+                jac = self._loaded_jac
+            else:
+                _, jac = self.cache.load_entry(self._values, copy=False)
             if jac:
                 self._jac.update(jac)
                 entry_exists = True
@@ -207,14 +271,29 @@ class Discipline:
         """
         if input_values is None:
             input_values = {}
-        self._values.update(self.get_default_inputs())
-        self._values.update(copy_dict_1d(self.input_vars, input_values))
 
-        try:
-            self._values = verify_dict_1d(
-                self.input_vars, self._values, self._dtype)
-        except Exception as e:
-            logger.error(f"{self.name}: {e}")
+        # The input values are copied into a single contiguous array,
+        # and each variable holds a view into it
+        self._input_arr = None
+        values_arr = zeros(self._n_inputs, self._dtype)
+        idx = 0
+        for var in self.input_vars:
+            if var.name in input_values:
+                value = atleast_1d(input_values[var.name])
+            elif var.name in self._default_inputs:
+                value = self._default_inputs[var.name]
+            else:
+                logger.error(
+                    f"{self.name}: Missing value for Variable {var.name}.")
+                return
+            if var.size != value.size:
+                logger.error(
+                    f"{self.name}: Wrong size ({value.size}), for Variable {var.name} of size {var.size}.")
+                return
+            values_arr[idx: idx + var.size] = value.reshape(-1)
+            self._values[var.name] = values_arr[idx: idx + var.size]
+            idx += var.size
+        self._input_arr = values_arr
 
     def _eval(self) -> None:
         """
@@ -236,14 +315,23 @@ class Discipline:
             Dict[str, ndarray]: The output values.
         """
         # Reset values and jacobian
-        self._values, self._jac = {}, {}
+        self._values, self._jac, self._jac_arr = {}, {}, None
+        self._loaded_jac = None
 
         # Sanitize the inputs
         self._sanitize_inputs(input_values)
 
-        # Check if corresponding cache entry exists
+        # If the inputs are identical to those of the latest evaluation, reuse its outputs
+        # Else, check if corresponding cache entry exists
         # Else, evaluate using the given inputs
-        entry_exists = self._load_cache_entry_outputs()
+        input_key = None
+        if self._input_arr is not None:
+            input_key = self._input_arr.tobytes()
+        if self.cache is not None and input_key is not None and self._last_eval[0] == input_key:
+            self._values.update(self._last_eval[1])
+            entry_exists = True
+        else:
+            entry_exists = self._load_cache_entry_outputs()
         if entry_exists == False:
             self._eval()
 
@@ -251,6 +339,8 @@ class Discipline:
         try:
             self._values = verify_dict_1d(
                 self.output_vars, self._values, self._dtype)
+            self._last_eval = (input_key, {var.name: self._values[var.name]
+                                           for var in self.output_vars})
         except Exception as e:
             logger.error(f"{self.name}: {e}")
 
@@ -260,12 +350,76 @@ class Discipline:
 
         # Update cache and default inputs
         if self._approximating_jac == False:
-            self.add_default_inputs(self.get_input_values())
+            self.add_default_inputs(self.get_input_values(copy=False))
             if entry_exists == False:
                 self._add_cache_entry_outputs()
 
         return self.get_output_values()
 
+    def _eval_batch(self) -> None:
+        """
+        Update the values for the output variables, for a batch of input samples.
+        * self._values holds arrays of shape (n_samples, size) and should be updated here.
+        * By default, each sample is evaluated separately using self._eval().
+        """
+        batch_values = self._values
+        n_samples = batch_values[self.input_vars[0].name].shape[0]
+        outputs = {var.name: zeros((n_samples, var.size), self._dtype)
+                   for var in self.output_vars}
+        for i in range(n_samples):
+            self._values = {var.name: batch_values[var.name][i]
+                            for var in self.input_vars}
+            self._eval()
+            for var in self.output_vars:
+                outputs[var.name][i] = self._values[var.name]
+        self._values = batch_values
+        self._values.update(outputs)
+
+    def eval_batch(self, input_values: Dict[str, ndarray] = None) -> Dict[str, ndarray]:
+        """
+        Execute the discipline for a batch of input samples.
+        * The first axis of each input value is the sample axis. If no value is provided for a variable, the default value is used for all samples.
+        * The cache and the default inputs are not updated.
+
+        Args:
+            input_values (Dict[str, ndarray], optional): Input values for each variable, of shape (n_samples, size).
+
+        Returns:
+            Dict[str, ndarray]: The output values, of shape (n_samples, size).
+        """
+        if input_values is None:
+            input_values = {}
+
+        # Reshape the inputs, so that the first axis is the sample axis
+        batch_values = {}
+        for var in self.input_vars:
+            if var.name in input_values:
+                batch_values[var.name] = asarray(
+                    input_values[var.name], self._dtype).reshape(-1, var.size)
+        n_samples = max([value.shape[0]
+                        for value in batch_values.values()], default=1)
+
+        # Use the default values for missing inputs
+        default_inputs = self.get_default_inputs()
+        for var in self.input_vars:
+            if var.name not in batch_values:
+                if var.name not in default_inputs:
+                    logger.error(
+                        f"{self.name}: No value provided for {var.name}.")
+                    return {}
+                batch_values[var.name] = tile(asarray(
+                    default_inputs[var.name], self._dtype), (n_samples, 1))
+
+        # Evaluate all samples
+        self._values, self._jac, self._jac_arr = batch_values, {}, None
+        self._eval_batch()
+        self.n_eval += n_samples
+
+        outputs = {var.name: asarray(self._values[var.name], self._dtype).reshape(n_samples, var.size)
+                   for var in self.output_vars}
+        self._values = {}
+        return outputs
+
     def set_jacobian_approximation(self, method: DiffMethod = DiffMethod.FINITE_DIFFERENCE, eps: float = 1e-4) -> None:
         """
         Setup the jacobian approximation.
@@ -280,8 +434,14 @@ class Discipline:
     def _init_jacobian(self) -> None:
         """
         Initialize the jacobian.
+        * The blocks are the preallocated arrays, reset to zero.
+        They can be assigned in-place, e.g. self._jac["y"]["x"][:] = ...
         """
-        self._jac = initialize_dense_jac(self.dinput_vars, self.doutput_vars)
+        self._jac = {}
+        for out_name, blocks in self._jac_blocks.items():
+            self._jac[out_name] = blocks.copy()
+            for block in blocks.values():
+                block.fill(0.0)
 
     def _approximate_jacobian(self) -> None:
         """
@@ -289,19 +449,41 @@ class Discipline:
         """
         self._approximating_jac = True
         # Save the current input/output values
-        input_values = self.get_input_values()
-        output_values = self.get_output_values()
+        # Each evaluation creates new arrays, so references suffice
+        input_values = self.get_input_values(copy=False)
+        output_values = self.get_output_values(copy=False)
 
         # Approximate jacobian
         # Finite-differences
+        # If the discipline is vectorized, all perturbations are evaluated at once
         if self._diff_method == self.DiffMethod.FINITE_DIFFERENCE:
-            self._jac = finite_difference_approx(self.eval, self.dinput_vars, self.doutput_vars,
-                                                 self.get_input_values(), self.get_output_values(), self._jac, self._eps)
+            if self.vectorized:
+                self._jac = finite_difference_approx_batch(self.eval_batch, self.dinput_vars, self.doutput_vars,
+                                                           self.get_input_values(), output_values, self._jac, self._eps)
+            elif self.parallel_fd:
+                # The process pool only exists for the duration of the approximation,
+                # so that no worker processes are left behind
+                with ProcessPoolExecutor(max_workers=self.n_fd_workers) as executor:
+                    self._jac = finite_difference_approx_parallel(self._get_eval_copy(), self.dinput_vars,
+                                                                  self.doutput_vars, self.get_input_values(),
+                                                                  output_values, executor, self._jac, self._eps)
+                # The perturbations are evaluated by copies in the worker processes,
+                # thus they are counted here, one per differentiated input component
+                self.n_eval += get_variable_list_size(self.dinput_vars)
+            else:
+                self._jac = finite_difference_approx(self.eval, self.dinput_vars, self.doutput_vars,
+                                                     self.get_input_values(), output_values, self._jac, self._eps)
         # Complex-step
         if self._diff_method == self.DiffMethod.COMPLEX_STEP:
+            # The input values are cast to complex copies by the approximation,
+            # thus only the dictionary is copied
             self._dtype = COMPLEX_DTYPE
-            self._jac = complex_step_approx(self.eval, self.dinput_vars, self.doutput_vars,
-                                            self.get_input_values(), self._jac, self._eps)
+            if self.vectorized:
+                self._jac = complex_step_approx_batch(self.eval_batch, self.dinput_vars, self.doutput_vars,
+                                                      dict(input_values), self._jac, self._eps)
+            else:
+                self._jac = complex_step_approx(self.eval, self.dinput_vars, self.doutput_vars,
+                                                dict(input_values), self._jac, self._eps)
             self._dtype = FLOAT_DTYPE
 
         # Reset the values
@@ -309,6 +491,16 @@ class Discipline:
         self._values.update(output_values)
         self._approximating_jac = False
 
+    def _get_eval_copy(self) -> partial:
+        """
+        Get a picklable function that evaluates a deep copy of the discipline, without a cache.
+        * The discipline is pickled once, and each call unpickles its own copy,
+        so that no state is shared between evaluations.
+        """
+        disc = copy(self)
+        disc.cache = None
+        return partial(_eval_pickled_discipline, pickle.dumps(disc))
+
     def _differentiate(self) -> None:
         """
         Update the values for the jacobian.
@@ -329,9 +521,18 @@ class Discipline:
         Returns:
             Dict[str, ndarray]: The jacobian.
 
+        """
+        self._update_jacobian(input_values)
+        return self.get_jac()
+
+    def _update_jacobian(self, input_values: Dict[str, ndarray] = None) -> None:
+        """
+        Update the jacobian for a given set of input values, see differentiate().
+        * No copy of the jacobian is made, so that subclasses can post-process it with a single copy.
         """
         # Reset values and jacobian
-        self._values, self._jac = {}, {}
+        self._values, self._jac, self._jac_arr = {}, {}, None
+        self._loaded_jac = None
 
         # If approximating, enforce evaluation
         if self._diff_method != self.DiffMethod.ANALYTIC:
@@ -355,9 +556,15 @@ class Discipline:
                 self._approximate_jacobian()
 
         # Verify the jacobian and increment diff count
+        # The verified jacobian is stored in a single contiguous array,
+        # and each block is a view into it
         try:
             self._jac = verify_dict_2d(
                 self.dinput_vars, self.doutput_vars, self._jac, self._dtype)
+            self._jac_arr = dict_to_array_2d(
+                self.dinput_vars, self.doutput_vars, self._jac)
+            self._jac = array_to_dict_2d(
+                self.dinput_vars, self.doutput_vars, self._jac_arr)
         except Exception as e:
             logger.error(f"{self.name}: {e}")
 
@@ -366,4 +573,10 @@ class Discipline:
             self.n_diff += 1
             self._add_cache_entry_jac()
 
-        return self.get_jac()
+
+def _eval_pickled_discipline(disc_bytes: bytes, input_values: Dict[str, ndarray]) -> Dict[str, ndarray]:
+    """
+    Evaluate a pickled discipline.
+    * Defined at module level, so that it can be sent to worker processes.
+    """
+    return pickle.loads(disc_bytes).eval(input_values)
@@ -1,4 +1,5 @@
 from dataclasses import dataclass, field
+from sys import intern, version_info
 
 from numpy import ndarray, inf, ones
 from numpy import isinf, isneginf
@@ -6,15 +7,33 @@ from numpy import isinf, isneginf
 from msense.core.constants import FLOAT_DTYPE
 
 
-@dataclass(frozen=True)
+# Use slots where supported (Python >= 3.10),
+# for smaller instances and faster attribute access
+_DATACLASS_OPTIONS = {"slots": True} if version_info >= (3, 10) else {}
+
+
+@dataclass(frozen=True, **_DATACLASS_OPTIONS)
 class Variable:
     name: str = field(default=None, hash=True)
     size: int = field(default=1, hash=False)
     lb: float = field(default=-inf, hash=False)
     ub: float = field(default=inf, hash=False)
     keep_feasible: bool = field(default=False, hash=False)
+    # Bound arrays, without and with normalization, computed once at construction
+    _bounds: tuple = field(default=None, init=False, repr=False, compare=False, hash=False)
+    _norm_bounds: tuple = field(default=None, init=False, repr=False, compare=False, hash=False)
 
-    def get_bounds_as_array(self, use_normalization: bool = False):
+    def __post_init__(self):
+        # Intern the name, since it is used as a key in all value dictionaries
+        if isinstance(self.name, str):
+            object.__setattr__(self, "name", intern(self.name))
+
+        # The variable is immutable, so the bound arrays are computed only once.
+        # The arrays are shared between calls, and thus read-only.
+        object.__setattr__(self, "_bounds", self._compute_bounds(False))
+        object.__setattr__(self, "_norm_bounds", self._compute_bounds(True))
+
+    def _compute_bounds(self, use_normalization: bool):
         lb = self.lb * ones(self.size, FLOAT_DTYPE)
         ub = self.ub * ones(self.size, FLOAT_DTYPE)
         keep_feasible = self.keep_feasible * ones(self.size, bool)
@@ -25,8 +44,13 @@ class Variable:
             else:
                 lb, ub = self.norm_values(lb), self.norm_values(ub)
 
+        for arr in (lb, ub, keep_feasible):
+            arr.flags.writeable = False
         return lb, ub, keep_feasible
 
+    def get_bounds_as_array(self, use_normalization: bool = False):
+        return self._norm_bounds if use_normalization else self._bounds
+
     def norm_values(self, _val: ndarray) -> ndarray:
         return (_val - self.lb) / (self.ub - self.lb)
 
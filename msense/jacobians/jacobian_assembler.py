@@ -1,31 +1,46 @@
-from typing import Dict, List
+from typing import Dict, List, Tuple
+import logging
 
-from numpy import ndarray, reshape
-from scipy.sparse import dok_matrix, eye
-from scipy.sparse.linalg import spsolve
+from numpy import ndarray, reshape, concatenate, nonzero, zeros, ones, arange, full, nan
+from numpy import lexsort, bincount, cumsum
+from scipy.sparse import spmatrix, csr_matrix, csc_matrix
+from scipy.sparse.linalg import splu, SuperLU
 
 from msense.core.constants import FLOAT_DTYPE
 from msense.core.variable import Variable
 from msense.utils.array_and_dict_utils import get_variable_list_size, array_to_dict_2d
 
+logger = logging.getLogger(__name__)
+
 
 class JacobianAssembler:
     """
     Assemble jacobian matrices for a set of disciplines.
     """
 
-    def assemble_partial(self, input_vars: List[Variable], output_vars: List[Variable], partial: Dict[str, ndarray], as_residual: bool = False) -> dok_matrix:
+    def __init__(self) -> None:
+        # The latest factorization of dRdy and the matrix it corresponds to
+        self._lu = None
+
+        # The identity block triplets for each pair of input/output variable lists
+        self._identity_triplets: Dict[Tuple, Tuple[ndarray, ndarray, ndarray]] = {}
+
+    def assemble_partial(self, input_vars: List[Variable], output_vars: List[Variable], partial: Dict[str, ndarray],
+                         as_residual: bool = False, format: str = "csr") -> spmatrix:
         """
         Assemble partial derivatives from dictionary into a sparse matrix.
+        * The non-zero entries of each block are gathered as (row, column, value) triplets,
+        from which the matrix is constructed at once, directly in the requested format.
 
         Args:
             input_vars (List[Variable]): Input variables list.
             output_vars (List[Variable]): Output variables list.
             partial (Dict[str, ndarray]): Partial derivatives dictionary.
             residual (bool, optional): Whether to treat the output variables as residuals. Defaults to False.
+            format (str, optional): Sparse format of the assembled matrix. Defaults to "csr".
 
         Returns:
-            dok_matrix: Assembled matrix of partial derivatives.
+            spmatrix: Assembled matrix of partial derivatives.
         """
         # Sign is negative if the outputs are treated as residuals
         sign = 1.0
@@ -34,23 +49,90 @@ class JacobianAssembler:
 
         n_inputs = get_variable_list_size(input_vars)
         n_outputs = get_variable_list_size(output_vars)
-        dfdx = dok_matrix((n_outputs, n_inputs), dtype=FLOAT_DTYPE)
+
+        # The identity blocks, for variables that are both inputs and outputs
+        rows, cols, data = self._get_identity_triplets(input_vars, output_vars)
+        rows, cols, data = [rows], [cols], [data]
 
         row_idx = 0
         for out_var in output_vars:
             col_idx = 0
             for in_var in input_vars:
-                if out_var.name == in_var.name:
-                    dfdx[row_idx: row_idx + out_var.size, col_idx: col_idx +
-                         in_var.size] = eye(out_var.size, dtype=FLOAT_DTYPE)
-                else:
-                    if in_var.name in partial[out_var.name]:
-                        dfdx[row_idx: row_idx + out_var.size, col_idx: col_idx +
-                             in_var.size] = sign * partial[out_var.name][in_var.name]
+                if out_var.name != in_var.name and in_var.name in partial[out_var.name]:
+                    block = sign * partial[out_var.name][in_var.name]
+                    block_rows, block_cols = nonzero(block)
+                    rows.append(block_rows + row_idx)
+                    cols.append(block_cols + col_idx)
+                    data.append(block[block_rows, block_cols])
                 col_idx += in_var.size
             row_idx += out_var.size
 
-        return dfdx
+        return self._build_sparse(concatenate(rows), concatenate(cols), concatenate(data),
+                                  (n_outputs, n_inputs), format)
+
+    def _build_sparse(self, rows: ndarray, cols: ndarray, data: ndarray,
+                      shape: Tuple[int, int], format: str = "csr") -> spmatrix:
+        """
+        Build a sparse matrix in CSR or CSC format directly from (row, column, value) triplets,
+        without an intermediate matrix. Other formats are converted from CSR.
+        """
+        # For CSC, the columns are compressed instead of the rows
+        major, minor, n_major = rows, cols, shape[0]
+        if format == "csc":
+            major, minor, n_major = cols, rows, shape[1]
+
+        # Sort the entries by major, then by minor index
+        order = lexsort((minor, major))
+        indptr = zeros(n_major + 1, int)
+        indptr[1:] = cumsum(bincount(major, minlength=n_major))
+
+        if format == "csc":
+            return csc_matrix((data[order], minor[order], indptr), shape=shape, dtype=FLOAT_DTYPE)
+        matrix = csr_matrix((data[order], minor[order], indptr),
+                            shape=shape, dtype=FLOAT_DTYPE)
+        if format != "csr":
+            return matrix.asformat(format)
+        return matrix
+
+    def _get_identity_triplets(self, input_vars: List[Variable], output_vars: List[Variable]) -> Tuple[ndarray, ndarray, ndarray]:
+        """
+        Get the (row, column, value) triplets of the identity blocks,
+        for the variables that are both inputs and outputs.
+        * The triplets only depend on the variables, and are computed once.
+        """
+        key = (tuple(input_vars), tuple(output_vars))
+        if key not in self._identity_triplets:
+            rows, cols = [zeros(0, int)], [zeros(0, int)]
+            row_idx = 0
+            for out_var in output_vars:
+                col_idx = 0
+                for in_var in input_vars:
+                    if out_var.name == in_var.name:
+                        rows.append(arange(out_var.size) + row_idx)
+                        cols.append(arange(in_var.size) + col_idx)
+                    col_idx += in_var.size
+                row_idx += out_var.size
+            rows, cols = concatenate(rows), concatenate(cols)
+            self._identity_triplets[key] = (
+                rows, cols, ones(rows.size, FLOAT_DTYPE))
+        return self._identity_triplets[key]
+
+    def factorize(self, dRdy: csc_matrix) -> SuperLU:
+        """
+        Compute the LU factorization of dRdy.
+        * The latest factorization is kept, and reused if the same matrix is given again.
+
+        Args:
+            dRdy (csc_matrix): The matrix to factorize, in CSC format.
+
+        Returns:
+            SuperLU: The LU factorization of dRdy.
+        """
+        key = (dRdy.shape, dRdy.indptr.tobytes(),
+               dRdy.indices.tobytes(), dRdy.data.tobytes())
+        if self._lu is None or self._lu[0] != key:
+            self._lu = (key, splu(dRdy))
+        return self._lu[1]
 
     def assemble_total(self, input_vars: List[Variable], output_vars: List[Variable], coupling_vars: List[Variable], partial: Dict[str, ndarray]) -> Dict[str, Dict[str, ndarray]]:
         """
@@ -72,22 +154,30 @@ class JacobianAssembler:
 
         # Assemble the partial derivative matrices
         dRdy = self.assemble_partial(
-            coupling_vars, coupling_vars, partial, True)
+            coupling_vars, coupling_vars, partial, True, "csc")
         dRdx = self.assemble_partial(input_vars, coupling_vars, partial, True)
         dfdy = self.assemble_partial(
             coupling_vars, output_vars, partial, False)
         dfdx = self.assemble_partial(input_vars, output_vars, partial, False)
 
+        # Factorize dRdy, once for all right-hand sides
+        # * If dRdy is singular, the total derivatives are nan, as with spsolve
+        try:
+            lu = self.factorize(dRdy)
+        except RuntimeError as e:
+            logger.warning(f"Total derivatives cannot be computed: {e}")
+            lu = None
+
         # Compute the total derivatives, given by total = dfdy @ (-dRdy^-1 @ dRdx)
+        if lu is None:
+            total = full((n_outputs, n_inputs), nan, FLOAT_DTYPE)
         # Adjoint
-        if not n_inputs >= n_outputs:
-            dfdy, dRdy, dRdx = dfdy.tocsr(), dRdy.tocsr(), dRdx.tocsr()
-            dfdy, dRdy = dfdy.transpose(), dRdy.transpose()
-            total = dfdx - spsolve(dRdy, dfdy).transpose() @ dRdx
+        elif not n_inputs >= n_outputs:
+            adj = lu.solve(dfdy.transpose().toarray(), trans="T")
+            total = dfdx.toarray() - (dRdx.transpose() @ adj).transpose()
         # Direct
         else:
-            dfdy, dRdy, dRdx = dfdy.tocsr(), dRdy.tocsc(), dRdx.tocsc()
-            total = dfdx - dfdy @ spsolve(dRdy, dRdx)
+            total = dfdx.toarray() - dfdy @ lu.solve(dRdx.toarray())
 
         # Convert the array to dictionary
         if type(total) != ndarray:
@@ -1,9 +1,10 @@
-from typing import Callable, Dict, Tuple
+from typing import Callable, Dict, List, Tuple
 from abc import ABC, abstractmethod
 
 from numpy import ndarray
 
 from msense.core.discipline import Discipline
+from msense.utils.array_and_dict_utils import get_variable_list_slices
 
 
 class Driver(ABC):
@@ -18,7 +19,72 @@ class Driver(ABC):
         self.callback = callback
         self.iter = 0
 
+        # Slices of each input variable in the design vector,
+        # computed on first use, since the discipline may not be initialized yet
+        self._in_slices: List[Tuple[str, slice]] = None
+
+        # The latest iterate, and the output values and jacobian computed for it
+        self._reset_iterate()
+
+    def _reset_iterate(self) -> None:
+        self._iterate_key: bytes = None
+        self._iterate_values: Dict[str, ndarray] = None
+        self._iterate_jac: Dict[str, Dict[str, ndarray]] = None
+
+    def _set_iterate(self, x: ndarray) -> None:
+        """
+        Set the current iterate.
+        * The optimizers request the objective, constraints and their derivatives
+        for the same iterate, thus the results are kept until the iterate changes.
+        """
+        key = x.tobytes()
+        if key != self._iterate_key:
+            self._reset_iterate()
+            self._iterate_key = key
+
+    def _get_in_slices(self) -> List[Tuple[str, slice]]:
+        if self._in_slices is None:
+            self._in_slices = get_variable_list_slices(self.disc.input_vars)
+        return self._in_slices
+
+    def _to_dict(self, x: ndarray) -> Dict[str, ndarray]:
+        """
+        Get the values of each input variable, as views into the design vector.
+        """
+        return {name: x[sl] for name, sl in self._get_in_slices()}
+
+    def _jac_to_array(self, out_slices: List[Tuple[str, slice]], jac: Dict[str, Dict[str, ndarray]],
+                      jac_arr: ndarray) -> ndarray:
+        """
+        Write the jacobian of the given outputs in a preallocated array, in-place.
+        """
+        in_slices = self._get_in_slices()
+        for out_name, out_sl in out_slices:
+            for in_name, in_sl in in_slices:
+                jac_arr[out_sl, in_sl] = jac[out_name][in_name]
+        return jac_arr
+
+    def _eval_iterate(self, x: ndarray) -> Dict[str, ndarray]:
+        """
+        Evaluate the discipline at the given iterate, if not already evaluated.
+        """
+        self._set_iterate(x)
+        if self._iterate_values is None:
+            self._iterate_values = self.disc.eval(self._to_dict(x))
+        return self._iterate_values
+
+    def _differentiate_iterate(self, x: ndarray) -> Dict[str, Dict[str, ndarray]]:
+        """
+        Differentiate the discipline at the given iterate, if not already differentiated.
+        """
+        self._set_iterate(x)
+        if self._iterate_jac is None:
+            self._iterate_jac = self.disc.differentiate(self._to_dict(x))
+        return self._iterate_jac
+
     def _callback(self) -> None:
+        # The discipline may be modified by the callback
+        self._reset_iterate()
         if self.callback is not None:
             self.callback()
         self.iter += 1
@@ -3,8 +3,6 @@ from enum import Enum
 
 from msense.core.discipline import Discipline
 from msense.opt.drivers.driver import Driver
-from msense.opt.drivers.scipy_driver import ScipyDriver
-from msense.opt.drivers.ipopt_driver import IpoptDriver
 
 
 class DriverType(str, Enum):
@@ -19,7 +17,11 @@ def create_driver(discipline: Discipline, type: DriverType = DriverType.SCIPY_DR
 
     type = DriverType(type)
 
+    # The drivers are imported only when requested,
+    # to avoid loading their backends otherwise
     if type == DriverType.SCIPY_DRIVER:
+        from msense.opt.drivers.scipy_driver import ScipyDriver
         return ScipyDriver(discipline, **kwargs)
     elif type == DriverType.IPOPT_DRIVER:
+        from msense.opt.drivers.ipopt_driver import IpoptDriver
         return IpoptDriver(discipline, **kwargs)
@@ -1,13 +1,14 @@
 from typing import Dict, Tuple
 import logging
 
-from numpy import ndarray
+from numpy import ndarray, zeros
 
+from msense.core.constants import FLOAT_DTYPE
 from msense.opt.drivers.driver import Driver
-from msense.utils.array_and_dict_utils import dict_to_array_2d
 from msense.utils.array_and_dict_utils import normalize_dict_1d, denormalize_dict_1d
-from msense.utils.array_and_dict_utils import array_to_dict_1d, dict_to_array_1d
+from msense.utils.array_and_dict_utils import dict_to_array_1d
 from msense.utils.array_and_dict_utils import concatenate_variable_bounds
+from msense.utils.array_and_dict_utils import get_variable_list_slices
 from msense.core.discipline import Discipline
 
 
@@ -30,38 +31,51 @@ class IpoptDriver(Driver):
         This class defines the functions required by the Ipopt Problem class.
         """
 
-        def __init__(self, discipline: Discipline, callback) -> None:
-            self.disc = discipline
-            self.callback = callback
+        def __init__(self, driver: Driver) -> None:
+            self.driver = driver
+            self.disc = driver.disc
+
+            # Attributes used by each callback, looked up once
+            self._eval_iterate = driver._eval_iterate
+            self._differentiate_iterate = driver._differentiate_iterate
+            self._jac_to_array = driver._jac_to_array
+            self._obj_name = self.disc.output_vars[0].name
+
+            # Slices of each variable in the contiguous arrays used by Ipopt,
+            # computed once for all iterations
+            self._obj_slices = get_variable_list_slices(
+                self.disc.output_vars[:1])
+            self._con_slices = get_variable_list_slices(
+                self.disc.output_vars[1:])
+            n_in = sum([var.size for var in self.disc.input_vars])
+            n_obj = sum([var.size for var in self.disc.output_vars[:1]])
+            n_con = sum([var.size for var in self.disc.output_vars[1:]])
+
+            # Output buffers, filled in-place by each callback
+            self._grad_buf = zeros((n_obj, n_in), FLOAT_DTYPE)
+            self._con_buf = zeros(n_con, FLOAT_DTYPE)
+            self._jac_buf = zeros((n_con, n_in), FLOAT_DTYPE)
 
         def objective(self, x: ndarray) -> float:
-            x = array_to_dict_1d(self.disc.input_vars, x)
-            obj_value = self.disc.eval(x)[self.disc.output_vars[0].name]
+            obj_value = self._eval_iterate(x)[self._obj_name]
             return obj_value
 
         def gradient(self, x: ndarray) -> ndarray:
-            x = array_to_dict_1d(self.disc.input_vars, x)
-            grad = self.disc.differentiate(x)
-            grad = dict_to_array_2d(self.disc.input_vars,
-                                    [self.disc.output_vars[0]], grad, flatten=True)
-            return grad
+            grad = self._differentiate_iterate(x)
+            return self._jac_to_array(self._obj_slices, grad, self._grad_buf).reshape(-1)
 
         def constraints(self, x: ndarray) -> ndarray:
-            x = array_to_dict_1d(self.disc.input_vars, x)
-            con_values = self.disc.eval(x)
-            con_values = dict_to_array_1d(
-                self.disc.output_vars[1:], con_values)
-            return con_values
+            con_values = self._eval_iterate(x)
+            for name, sl in self._con_slices:
+                self._con_buf[sl] = con_values[name]
+            return self._con_buf
 
         def jacobian(self, x: ndarray) -> ndarray:
-            x = array_to_dict_1d(self.disc.input_vars, x)
-            con_jac = self.disc.differentiate(x)
-            con_jac = dict_to_array_2d(self.disc.input_vars,
-                                       self.disc.output_vars[1:], con_jac)
-            return con_jac
+            con_jac = self._differentiate_iterate(x)
+            return self._jac_to_array(self._con_slices, con_jac, self._jac_buf)
 
         def intermediate(self, *args) -> None:
-            self.callback()
+            self.driver._callback()
 
     def __init__(self, discipline: Discipline, **kwargs):
         if MSENSE_HAS_IPOPT is False:
@@ -71,6 +85,12 @@ class IpoptDriver(Driver):
         super().__init__(discipline, **kwargs)
         self.options = {"print_level": 0}
 
+        # Ipopt problems created by previous solves, for each normalization setting
+        self._nlp_cache: Dict[bool, IpoptProblem] = {}
+
+        # The options already added to each of the above problems
+        self._nlp_options: Dict[bool, Dict[str, any]] = {}
+
     def solve(self, input_values: Dict[str, ndarray], use_norm: bool) -> Tuple[bool, str]:
         # Normalize the input values if needed,
         # and covert to 1d numpy array
@@ -80,26 +100,37 @@ class IpoptDriver(Driver):
         input_values = dict_to_array_1d(
             self.disc.input_vars, input_values)
 
-        # Reset the iteration number
+        # Reset the iteration number and the latest iterate
         self.iter = 0
-
-        # Get the design variable and constraint bounds as arrays
-        lb, ub, _ = concatenate_variable_bounds(self.disc.input_vars, use_norm)
-        cl, cu, _ = concatenate_variable_bounds(
-            self.disc.output_vars[1:], use_norm)
-
-        # Create the Ipopt optimization problem
-        wrapped_disc = self._WrappedDiscipline(self.disc, self._callback)
-        ipopt_nlp = IpoptProblem(
-            n=len(lb), m=len(cl),
-            problem_obj=wrapped_disc,
-            lb=lb, ub=ub, cl=cl, cu=cu)
-
-        # Add the specified options
+        self._reset_iterate()
+
+        # Create the Ipopt optimization problem,
+        # or reuse the one created by a previous solve
+        ipopt_nlp = self._nlp_cache.get(use_norm)
+        if ipopt_nlp is None:
+            # Get the design variable and constraint bounds as arrays
+            lb, ub, _ = concatenate_variable_bounds(
+                self.disc.input_vars, use_norm)
+            cl, cu, _ = concatenate_variable_bounds(
+                self.disc.output_vars[1:], use_norm)
+
+            wrapped_disc = self._WrappedDiscipline(self)
+            ipopt_nlp = IpoptProblem(
+                n=len(lb), m=len(cl),
+                problem_obj=wrapped_disc,
+                lb=lb, ub=ub, cl=cl, cu=cu)
+            self._nlp_cache[use_norm] = ipopt_nlp
+            self._nlp_options[use_norm] = {}
+
+        # Add the specified options,
+        # except for those already added to the problem with the same value
         self.options["max_iter"] = self.n_iter_max
         self.options["tol"] = self.tol
+        nlp_options = self._nlp_options[use_norm]
         for key, val in self.options.items():
-            ipopt_nlp.add_option(key, val)
+            if key not in nlp_options or nlp_options[key] != val:
+                ipopt_nlp.add_option(key, val)
+                nlp_options[key] = val
 
         # Solve the optimization problem using Ipopt
         _, result = ipopt_nlp.solve(input_values)
@@ -1,14 +1,16 @@
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
 
-from numpy import ndarray
+from numpy import ndarray, zeros
 from scipy.optimize import NonlinearConstraint, Bounds, minimize
 
+from msense.core.constants import FLOAT_DTYPE
 from msense.core.variable import Variable
 from msense.core.discipline import Discipline
 from msense.utils.array_and_dict_utils import concatenate_variable_bounds
-from msense.utils.array_and_dict_utils import array_to_dict_1d, dict_to_array_1d
+from msense.utils.array_and_dict_utils import dict_to_array_1d
 from msense.utils.array_and_dict_utils import normalize_dict_1d, denormalize_dict_1d
-from msense.utils.array_and_dict_utils import array_to_dict_2d, dict_to_array_2d, denormalize_dict_2d
+from msense.utils.array_and_dict_utils import get_variable_list_size
+from msense.utils.array_and_dict_utils import get_variable_list_slices
 from msense.opt.drivers.driver import Driver
 
 
@@ -22,46 +24,82 @@ class ScipyDriver(Driver):
         self.method = method
         self.options = {}
 
+        # Wrapped functions, bounds and constraints created by previous solves,
+        # for each method and normalization setting
+        self._wrapped_cache: Dict[Tuple[str, bool], Tuple] = {}
+
+    # The wrapped functions are called by the optimizer at each iteration,
+    # thus the attributes they use are looked up once, when they are created.
+
     def _wrap_objective(self):
+        eval_iterate = self._eval_iterate
+        obj_name = self.disc.output_vars[0].name
+
         def func(x: ndarray) -> float:
-            x = array_to_dict_1d(self.disc.input_vars, x)
-            obj_value = self.disc.eval(x)[self.disc.output_vars[0].name]
+            obj_value = eval_iterate(x)[obj_name]
             if self.iter == 0:
                 self._callback()
             return obj_value
         return func
 
     def _wrap_gradient(self):
+        # The gradient is written in a preallocated buffer.
+        # A copy is returned, since SciPy may keep the gradients of previous iterates.
+        differentiate_iterate, jac_to_array = self._differentiate_iterate, self._jac_to_array
+        obj_slices = get_variable_list_slices(self.disc.output_vars[:1])
+        grad_buf = zeros((self.disc.output_vars[0].size,
+                          get_variable_list_size(self.disc.input_vars)), FLOAT_DTYPE)
+
         def gradient(x: ndarray) -> ndarray:
-            x = array_to_dict_1d(self.disc.input_vars, x)
-            grad = self.disc.differentiate(x)
-            grad = dict_to_array_2d(self.disc.input_vars,
-                                    [self.disc.output_vars[0]], grad, flatten=True)
-            return grad
+            grad = differentiate_iterate(x)
+            return jac_to_array(obj_slices, grad, grad_buf).reshape(-1).copy()
         return gradient
 
-    def _wrap_constraints(self, use_norm: bool) -> NonlinearConstraint:
-        def wrap_single_constraint(con: Variable):
-            def constraint(x: ndarray) -> ndarray:
-                x = array_to_dict_1d(self.disc.input_vars, x)
-                con_value = self.disc.eval(x)[con.name]
-                return con_value
+    def _wrap_constraints(self, use_norm: bool) -> List[NonlinearConstraint]:
+        # The constraints are grouped by keep_feasible setting (which SciPy requires to be scalar)
+        # and by type (equality or inequality, which SciPy otherwise separates internally).
+        # Each group is wrapped as a single NonlinearConstraint,
+        # whose values and jacobian are written in preallocated buffers.
+        # Copies are returned, since SciPy may keep the values of previous iterates.
+        eval_iterate = self._eval_iterate
+        differentiate_iterate, jac_to_array = self._differentiate_iterate, self._jac_to_array
+        n_in = get_variable_list_size(self.disc.input_vars)
+
+        def wrap_constraint_group(con_vars: List[Variable]):
+            con_slices = get_variable_list_slices(con_vars)
+            n_con = get_variable_list_size(con_vars)
+            con_buf = zeros(n_con, FLOAT_DTYPE)
+            jac_buf = zeros((n_con, n_in), FLOAT_DTYPE)
+
+            # With a single constraint variable, its values are used as they are
+            if len(con_vars) == 1:
+                con_name = con_vars[0].name
+
+                def constraint(x: ndarray) -> ndarray:
+                    return eval_iterate(x)[con_name].copy()
+            else:
+                def constraint(x: ndarray) -> ndarray:
+                    con_values = eval_iterate(x)
+                    for con_name, con_sl in con_slices:
+                        con_buf[con_sl] = con_values[con_name]
+                    return con_buf.copy()
 
             def jacobian(x: ndarray) -> ndarray:
-                x = array_to_dict_1d(self.disc.input_vars, x)
-                con_jac = self.disc.differentiate(x)
-                con_jac = dict_to_array_2d(self.disc.input_vars,
-                                           [con], con_jac)
-                return con_jac
+                con_jac = differentiate_iterate(x)
+                return jac_to_array(con_slices, con_jac, jac_buf).copy()
 
             return constraint, jacobian
 
-        constraints = []
+        groups: Dict[Tuple[bool, bool], List[Variable]] = {}
         for con in self.disc.output_vars[1:]:
-            constraint, jacobian = wrap_single_constraint(con)
-            cl, cu, kf = con.get_bounds_as_array(use_norm)
+            groups.setdefault((con.keep_feasible, con.lb == con.ub), []).append(con)
+
+        constraints = []
+        for (keep_feasible, _), con_vars in groups.items():
+            constraint, jacobian = wrap_constraint_group(con_vars)
+            cl, cu, _ = concatenate_variable_bounds(con_vars, use_norm)
             constraints.append(NonlinearConstraint(
-                constraint, cl, cu, jacobian, keep_feasible=kf[0]))
+                constraint, cl, cu, jacobian, keep_feasible=keep_feasible))
         return constraints
 
     def _wrap_callback(self):
@@ -92,17 +130,26 @@ class ScipyDriver(Driver):
         input_values = dict_to_array_1d(
             self.disc.input_vars, input_values)
 
-        # Reset the iteration number
+        # Reset the iteration number and the latest iterate
         self.iter = 0
+        self._reset_iterate()
+
+        # Wrap the problem, or reuse the wrappers created by a previous solve
+        key = (self.method, use_norm)
+        if key not in self._wrapped_cache:
+            self._wrapped_cache[key] = (self._wrap_objective(), self._wrap_gradient(),
+                                        self._wrap_bounds(use_norm), self._wrap_constraints(use_norm),
+                                        self._wrap_callback())
+        func, gradient, bounds, constraints, callback = self._wrapped_cache[key]
 
         # Solve the optimization problem using SciPy
         self.options["maxiter"] = self.n_iter_max
-        result = minimize(fun=self._wrap_objective(),
+        result = minimize(fun=func,
                           x0=input_values,
-                          jac=self._wrap_gradient(),
-                          bounds=self._wrap_bounds(use_norm),
-                          constraints=self._wrap_constraints(use_norm),
-                          callback=self._wrap_callback(),
+                          jac=gradient,
+                          bounds=bounds,
+                          constraints=constraints,
+                          callback=callback,
                           method=self.method, tol=self.tol,
                           options=self.options)
 
@@ -1,13 +1,15 @@
 from typing import Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
 
 from numpy import ndarray
-from numpy import zeros
-from numpy.linalg import norm
+from numpy import zeros, empty, subtract, full, dot
 
 from msense.core.constants import FLOAT_DTYPE
 from msense.core.variable import Variable
 from msense.core.discipline import Discipline
-from msense.utils.array_and_dict_utils import copy_dict_1d
+from msense.utils.array_and_dict_utils import dict_to_array_1d, array_to_dict_1d
+from msense.utils.array_and_dict_utils import get_variable_list_size, get_variable_list_slices
+from msense.utils.array_and_dict_utils import dict_to_array_2d
 from msense.utils.graph_utils import get_couplings
 from msense.utils.graph_utils import separate_local_global
 from msense.opt.problems.opt_problem import OptProblem
@@ -27,23 +29,27 @@ class COSubProblem(OptProblem):
 
         self.disc = discipline
 
+        # Sets of the discipline variables, for constant time membership checks
+        disc_inputs, disc_outputs = set(
+            self.disc.input_vars), set(self.disc.output_vars)
+
         self.local_design_vars = local_design_vars
         self.global_design_vars = []
         for var in global_design_vars:
-            if var in self.disc.input_vars:
+            if var in disc_inputs:
                 self.global_design_vars.append(var)
 
         self.output_couplings = []
         self.input_couplings = []
         for var in coupling_vars:
-            if var in self.disc.output_vars:
+            if var in disc_outputs:
                 self.output_couplings.append(var)
-            elif var in self.disc.input_vars:
+            elif var in disc_inputs:
                 self.input_couplings.append(var)
 
         self.constraints = []
         for var in constraints:
-            if var in self.disc.output_vars:
+            if var in disc_outputs:
                 self.constraints.append(var)
 
         super().__init__(discipline.name + "SubProblem",
@@ -51,73 +57,99 @@ class COSubProblem(OptProblem):
                          objective,
                          self.constraints)
 
+        # Names of the variables used in each evaluation
+        self._design_names = tuple([var.name for var in self.design_vars])
+        self._input_coupling_names = tuple(
+            [var.name for var in self.input_couplings])
+        self._constraint_names = tuple([var.name for var in self.constraints])
+
         # Values provided by the system-level optimizer
         # These are set at the beginning
         # of each system-level optimizer iteration
-        self._global_values = {}
+        # * The values are stored in a contiguous array, allocated once.
+        # The variables whose discrepancy from the global values forms the objective come first,
+        # so that their concatenated global values are a view of the array.
+        self._feasibility_vars = self.local_design_vars + \
+            self.global_design_vars + self.output_couplings
+        self._feasibility_slices = get_variable_list_slices(self._feasibility_vars)
+        self._global_slices = get_variable_list_slices(
+            self._feasibility_vars + self.input_couplings)
+        self._global_arr = zeros(get_variable_list_size(
+            self._feasibility_vars + self.input_couplings), FLOAT_DTYPE)
+        self._global_values = {name: self._global_arr[sl]
+                               for name, sl in self._global_slices}
+        self._global_feasibility_arr = self._global_arr[:get_variable_list_size(
+            self._feasibility_vars)]
+
+        # The global values and starting point of the latest solve
+        self._global_key: bytes = None
+        self._solve_key: Tuple[bytes, bytes] = None
 
     def set_global_values(self, values: Dict[str, ndarray]):
-        self._global_values = copy_dict_1d(
-            self.local_design_vars + self.global_design_vars +
-            self.input_couplings + self.output_couplings, values)
+        for name, sl in self._global_slices:
+            self._global_arr[sl] = values[name]
+        self._global_key = self._global_arr.tobytes()
+
+    def solve(self, design_vec: Dict[str, ndarray]) -> Dict[str, any]:
+        # The subproblem is deterministic, thus it is not solved again
+        # for the same global values and starting point
+        key = (self._global_key, dict_to_array_1d(
+            self.design_vars, design_vec).tobytes())
+        if key == self._solve_key:
+            return self.get_input_values()
+
+        result = super().solve(design_vec)
+        self._solve_key = key
+        return result
 
     def _eval(self):
         # Gather the discipline inputs
-        local_values = {}
-        for var in self.design_vars:
-            local_values[var.name] = self._values[var.name].copy()
-        for var in self.input_couplings:
-            local_values[var.name] = self._global_values[var.name].copy()
+        # * No copies are needed, since the discipline copies its inputs
+        local_values = {name: self._values[name]
+                        for name in self._design_names}
+        for name in self._input_coupling_names:
+            local_values[name] = self._global_values[name]
 
         # Evaluate the discipline
         local_values.update(self.disc.eval(local_values))
 
         # Update the local constraints
-        for var in self.constraints:
-            self._values[var.name] = local_values[var.name]
-
-        # Evaluate the feasibility constraint
-        self._values[self.objective.name] = zeros(
-            self.objective.size, FLOAT_DTYPE)
-
-        for var in self.local_design_vars:
-            self._values[self.objective.name] += norm(
-                self._global_values[var.name] - self._values[var.name])**2
-
-        for var in self.global_design_vars:
-            self._values[self.objective.name] += norm(
-                self._values[var.name] - self._global_values[var.name])**2
-
-        for var in self.output_couplings:
-            self._values[self.objective.name] += norm(
-                self._global_values[var.name] - local_values[var.name])**2
+        for name in self._constraint_names:
+            self._values[name] = local_values[name]
+
+        # Evaluate the feasibility constraint,
+        # as the squared norm of the discrepancy from the global values
+        diff = empty(self._global_feasibility_arr.size, FLOAT_DTYPE)
+        for name, sl in self._feasibility_slices:
+            diff[sl] = local_values[name]
+        subtract(diff, self._global_feasibility_arr, out=diff)
+        self._values[self.objective.name] = full(
+            self.objective.size, dot(diff, diff), FLOAT_DTYPE)
 
     def _differentiate(self) -> None:
 
         disc_values = self.disc.get_values()
         disc_jac = self.disc.differentiate()
 
-        for in_var in self.local_design_vars:
-            self._jac[self.objective.name][in_var.name] = -2 * \
-                (self._global_values[in_var.name] - self._values[in_var.name])
-
-            for out_var in self.output_couplings:
-                self._jac[self.objective.name][in_var.name] += -2 * \
-                    (self._global_values[out_var.name] - disc_values[out_var.name]
-                     ) @ disc_jac[out_var.name][in_var.name]
-
-        for in_var in self.global_design_vars:
-            self._jac[self.objective.name][in_var.name] = 2 * \
-                (self._values[in_var.name] - self._global_values[in_var.name])
-
-            for out_var in self.output_couplings:
-                self._jac[self.objective.name][in_var.name] += -2 * \
-                    (self._global_values[out_var.name] - disc_values[out_var.name]
-                     ) @ disc_jac[out_var.name][in_var.name]
-
-        for con in self.constraints:
-            for in_var in self.design_vars:
-                self._jac[con.name][in_var.name] = disc_jac[con.name][in_var.name]
+        # The gradient of the feasibility objective w.r.t the design variables,
+        # computed for all of them at once
+        # * The direct term is 2 * (values - global values)
+        # * The term due to the output couplings is -2 * (global values - coupling values) @ dcoupling/dx
+        design_arr = dict_to_array_1d(self.design_vars, self._values)
+        global_design_arr = dict_to_array_1d(
+            self.design_vars, self._global_values)
+        coupling_diff = dict_to_array_1d(self.output_couplings, self._global_values) - \
+            dict_to_array_1d(self.output_couplings, disc_values)
+        coupling_jac = dict_to_array_2d(
+            self.design_vars, self.output_couplings, disc_jac)
+        grad = 2 * (design_arr - global_design_arr) - \
+            2 * (coupling_diff @ coupling_jac)
+        self._jac[self.objective.name].update(
+            array_to_dict_1d(self.design_vars, grad))
+
+        for con_name in self._constraint_names:
+            for in_name in self._design_names:
+                self._jac[con_name][in_name] = disc_jac[con_name][in_name]
 
 
 class CO(OptProblem):
@@ -126,7 +158,7 @@ class CO(OptProblem):
     """
 
     def __init__(self, disciplines: List[Discipline], warm_start: bool = False,
-                 feasibility_tol: float = 0.0, **kwargs) -> None:
+                 feasibility_tol: float = 0.0, parallel: bool = False, **kwargs) -> None:
         self.disciplines = disciplines[:-1]
         self.objective_discipline = disciplines[-1]
         self.warm_start = warm_start
@@ -169,23 +201,58 @@ class CO(OptProblem):
             self.feasibility_constraints
         super().__init__(**kwargs)
 
+        # Names of the global constraints
+        self._global_constraint_names = tuple(
+            [var.name for var in self.global_constraints])
+
+        # Thread pool for the concurrent solution of the subproblems
+        # * Only exists for the duration of each solve, so that no threads are left behind
+        self.parallel = parallel
+        self._executor: ThreadPoolExecutor = None
+
+    def solve(self, design_vec: Dict[str, ndarray]) -> Dict[str, any]:
+        if not self.parallel or len(self.subproblems) < 2:
+            return super().solve(design_vec)
+
+        with ThreadPoolExecutor(max_workers=len(self.subproblems)) as executor:
+            self._executor = executor
+            try:
+                return super().solve(design_vec)
+            finally:
+                self._executor = None
+
     def _eval(self) -> None:
         # Solve the subproblems
-        # Get the values of the feasibility constraints
+        # These are independent, and can be solved concurrently
+        start_values = []
         for subprob in self.subproblems:
             subprob.set_global_values(self._values)
             if self.driver.iter == 0 or self.warm_start is False:
-                subprob.solve(copy_dict_1d(subprob.design_vars, self._values))
+                # The starting values are not modified by the subproblem, thus no copies are needed
+                start_values.append({name: self._values[name]
+                                    for name in subprob._design_names})
             else:
-                subprob.solve(subprob.get_input_values())
+                start_values.append(subprob.get_input_values())
+
+        if self._executor is None:
+            for subprob, values in zip(self.subproblems, start_values):
+                subprob.solve(values)
+        else:
+            futures = [self._executor.submit(subprob.solve, values)
+                       for subprob, values in zip(self.subproblems, start_values)]
+            for future in futures:
+                future.result()
+
+        # Get the values of the feasibility constraints
+        for subprob in self.subproblems:
             self._values[subprob.objective.name] = subprob.get_output_values()[
                 subprob.objective.name]
 
         # Evaluate the objective and global constraints
         obj_disc_values = self.objective_discipline.eval(self._values)
         self._values[self.objective.name] = obj_disc_values[self.objective.name]
-        for var in self.global_constraints:
-            self._values[var.name] = obj_disc_values[var.name]
+        for name in self._global_constraint_names:
+            self._values[name] = obj_disc_values[name]
 
     def _differentiate(self) -> None:
         # Differentiate the feasibility constraints
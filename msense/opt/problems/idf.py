@@ -1,11 +1,13 @@
-from typing import Dict, List
+from typing import Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
 
-from numpy import ndarray, ones
-from numpy.linalg import norm
+from numpy import ndarray, eye, add, empty, subtract
 
 from msense.core.constants import FLOAT_DTYPE
 from msense.core.variable import Variable
 from msense.core.discipline import Discipline
+from msense.utils.array_and_dict_utils import get_variable_list_offsets, get_variable_list_size
+from msense.utils.array_and_dict_utils import get_variable_list_slices
 from msense.utils.graph_utils import get_couplings
 from msense.opt.problems.opt_problem import OptProblem
 
@@ -16,7 +18,7 @@ class IDF(OptProblem):
     """
 
     def __init__(self, disciplines: List[Discipline], scalar_feasibility_constraints: bool = False,
-                 feasibility_tol: float = 0.0, **kwargs) -> None:
+                 feasibility_tol: float = 0.0, parallel: bool = False, **kwargs) -> None:
         self.disciplines = disciplines
         self.scalar_feasiblity_constraints = scalar_feasibility_constraints
 
@@ -36,72 +38,157 @@ class IDF(OptProblem):
         else:
             kwargs["constraints"] += self.feasibility_constraints
 
+        # Offsets and slices of the coupling variables,
+        # and of their feasibility constraints, in contiguous arrays
+        self._coupling_offsets = get_variable_list_offsets(self.coupling_vars)
+        self._coupling_slices = get_variable_list_slices(self.coupling_vars)
+        self._con_slices = get_variable_list_slices(
+            self.feasibility_constraints)
+
         super().__init__(**kwargs)
 
-    def _compute_feasibility_constraint(self, var: Variable, disc_outputs: Dict[str, ndarray]) -> ndarray:
-        con_value = None
-        if self.scalar_feasiblity_constraints:
-            con_value = norm(
-                self._values[var.name] - disc_outputs[var.name])**2
-        else:
-            con_value = self._values[var.name] - disc_outputs[var.name]
-        return con_value
+        # The (output, input) pairs with a nonzero jacobian block,
+        # found from the structure of the partials on the first differentiation
+        self._feasibility_jac_pairs: List[Tuple[Variable, Variable]] = None
+        self._jac_pairs: List[Tuple[str, str]] = None
+
+        # Names of the outputs
+        self._output_names = tuple([var.name for var in self.output_vars])
+
+        # Names of the inputs of each discipline that are provided by the problem
+        input_names = set([var.name for var in self.input_vars])
+        self._disc_input_names = [[var.name for var in disc.input_vars if var.name in input_names]
+                                  for disc in self.disciplines]
+
+        # Buffers for the coupling values, the discipline outputs and their difference,
+        # filled in-place by each evaluation and differentiation
+        n_coupling = get_variable_list_size(self.coupling_vars)
+        self._coupling_buf = empty(n_coupling, FLOAT_DTYPE)
+        self._output_buf = empty(n_coupling, FLOAT_DTYPE)
+        self._diff_buf = empty(n_coupling, FLOAT_DTYPE)
+
+        # Identity blocks of the feasibility constraint jacobians, for each size
+        self._identity_blocks: Dict[int, ndarray] = {}
+
+        # Thread pool for the concurrent evaluation of the disciplines
+        # * Only exists for the duration of each solve, so that no threads are left behind
+        self.parallel = parallel
+        self._executor: ThreadPoolExecutor = None
+
+    def _compute_feasibility_constraints(self, disc_outputs: Dict[str, ndarray]) -> Dict[str, ndarray]:
+        """
+        Compute the feasibility constraints for all coupling variables at once,
+        using the concatenated coupling values.
+        * The constraint values may be views into a reused buffer, and are copied when verified.
+        """
+        con_arr = self._compute_coupling_diff(disc_outputs)
+        if self.scalar_feasiblity_constraints and con_arr.size:
+            con_arr = add.reduceat(con_arr * con_arr, self._coupling_offsets)
+        return {name: con_arr[sl] for name, sl in self._con_slices}
+
+    def _compute_coupling_diff(self, disc_outputs: Dict[str, ndarray]) -> ndarray:
+        """
+        Compute the difference between the coupling values and the discipline outputs,
+        as a contiguous array.
+        * The result is written in a preallocated buffer, which is overwritten by the next call.
+        """
+        for name, sl in self._coupling_slices:
+            self._coupling_buf[sl] = self._values[name]
+            self._output_buf[sl] = disc_outputs[name]
+        return subtract(self._coupling_buf, self._output_buf, out=self._diff_buf)
+
+    def _get_identity(self, size: int) -> ndarray:
+        """
+        Get a read-only identity matrix of the given size, allocated once.
+        """
+        if size not in self._identity_blocks:
+            block = eye(size, dtype=FLOAT_DTYPE)
+            block.flags.writeable = False
+            self._identity_blocks[size] = block
+        return self._identity_blocks[size]
 
     def _compute_feasibility_constraint_jac(self, in_var: Variable, out_var: Variable,
-                                            disc_outputs: Dict[str, ndarray], disc_partials: Dict[str, Dict[str, ndarray]]) -> ndarray:
+                                            coupling_diff: Dict[str, ndarray], disc_partials: Dict[str, Dict[str, ndarray]]) -> ndarray:
         con_jac = None
         if self.scalar_feasiblity_constraints:
             if in_var.name == out_var.name:
-                con_jac = 2 * (self._values[out_var.name] -
-                               disc_outputs[out_var.name])
+                con_jac = 2 * coupling_diff[out_var.name]
             elif in_var.name in disc_partials[out_var.name]:
-                con_jac = -2 * (self._values[out_var.name] - disc_outputs[out_var.name]
-                                ) @ disc_partials[out_var.name][in_var.name]
+                con_jac = -2 * coupling_diff[out_var.name] @ \
+                    disc_partials[out_var.name][in_var.name]
         else:
             if in_var.name == out_var.name:
-                con_jac = ones((out_var.size, out_var.size), FLOAT_DTYPE)
+                con_jac = self._get_identity(out_var.size)
             elif in_var.name in disc_partials[out_var.name]:
                 con_jac = -disc_partials[out_var.name][in_var.name]
         return con_jac
 
+    def solve(self, design_vec: Dict[str, ndarray]) -> Dict[str, any]:
+        if not self.parallel or len(self.disciplines) < 2:
+            return super().solve(design_vec)
+
+        with ThreadPoolExecutor(max_workers=len(self.disciplines)) as executor:
+            self._executor = executor
+            try:
+                return super().solve(design_vec)
+            finally:
+                self._executor = None
+
     def _eval(self):
         # Evaluate the disciplines
+        # These are independent, since the couplings are design variables,
+        # and can be evaluated concurrently
+        input_values = [{name: self._values[name] for name in names}
+                        for names in self._disc_input_names]
+
         outputs = {}
-        for disc in self.disciplines:
-            inputs = {}
-            for var in disc.input_vars:
-                if var.name in self._values:
-                    inputs[var.name] = self._values[var.name]
-            outputs.update(disc.eval(inputs))
+        if self._executor is None:
+            for disc, inputs in zip(self.disciplines, input_values):
+                outputs.update(disc.eval(inputs))
+        else:
+            futures = [self._executor.submit(disc.eval, inputs)
+                       for disc, inputs in zip(self.disciplines, input_values)]
+            for future in futures:
+                outputs.update(future.result())
 
         # Evaluate feasibility constraints
-        for var in self.coupling_vars:
-            outputs[var.name +
-                    "_con"] = self._compute_feasibility_constraint(var, outputs)
+        outputs.update(self._compute_feasibility_constraints(outputs))
 
         # Set the values of the constraints and the objective
-        for var in self.output_vars:
-            self._values[var.name] = outputs[var.name]
+        for name in self._output_names:
+            self._values[name] = outputs[name]
 
     def _differentiate(self) -> None:
         # Evaluate the partials
+        # * The outputs of the latest evaluation are only read, thus not copied
         partials = {}
         outputs = {}
         for disc in self.disciplines:
-            outputs.update(disc.get_output_values())
+            outputs.update(disc.get_output_values(copy=False))
             partials.update(disc.differentiate())
 
+        # The structure of the partials does not change,
+        # thus the pairs with a nonzero jacobian block are found once
+        if self._jac_pairs is None:
+            self._feasibility_jac_pairs = [(out_var, in_var) for out_var in self.coupling_vars
+                                           for in_var in self.design_vars
+                                           if in_var.name == out_var.name or in_var.name in partials[out_var.name]]
+            self._jac_pairs = [(out_var.name, in_var.name) for out_var in self.output_vars
+                               if out_var.name in partials
+                               for in_var in self.design_vars
+                               if in_var.name in partials[out_var.name]]
+
         # Feasibility constraint jacobians
-        for out_var in self.coupling_vars:
-            for in_var in self.design_vars:
-                con_jac = self._compute_feasibility_constraint_jac(
-                    in_var, out_var, outputs, partials)
-                if con_jac is not None:
-                    self._jac[out_var.name + "_con"][in_var.name] = con_jac
+        # * The coupling differences are computed once, for all pairs
+        coupling_diff = None
+        if self.scalar_feasiblity_constraints:
+            coupling_diff_arr = self._compute_coupling_diff(outputs)
+            coupling_diff = {name: coupling_diff_arr[sl]
+                             for name, sl in self._coupling_slices}
+        for out_var, in_var in self._feasibility_jac_pairs:
+            self._jac[out_var.name + "_con"][in_var.name] = self._compute_feasibility_constraint_jac(
+                in_var, out_var, coupling_diff, partials)
 
         # Objective and constraint jacobians
-        for out_var in self.output_vars:
-            if out_var.name in partials:
-                for in_var in self.design_vars:
-                    if in_var.name in partials[out_var.name]:
-                        self._jac[out_var.name][in_var.name] = partials[out_var.name][in_var.name]
+        for out_name, in_name in self._jac_pairs:
+            self._jac[out_name][in_name] = partials[out_name][in_name]
@@ -28,9 +28,10 @@ class MDF(OptProblem):
 
         # Grab the values of the constraints and the objective
         # from the disciplinary outputs
+        # * No copies are needed, since the values are copied when verified
         disc_outputs = {}
         for disc in self.disciplines:
-            disc_outputs.update(disc.get_output_values())
+            disc_outputs.update(disc.get_output_values(copy=False))
         for var in self.output_vars:
             self._values[var.name] = disc_outputs[var.name]
 
@@ -1,12 +1,13 @@
 from typing import Dict, List
 import logging
 
-from numpy import ndarray, isinf, isneginf
-import matplotlib.pyplot as plt
+from numpy import ndarray, isfinite
 
 from msense.core.variable import Variable
-from msense.utils.array_and_dict_utils import copy_dict_1d
+from msense.utils.array_and_dict_utils import dict_to_array_1d, array_to_dict_1d
 from msense.utils.array_and_dict_utils import denormalize_dict_1d, normalize_dict_2d
+from msense.utils.array_and_dict_utils import array_to_dict_2d
+from msense.utils.array_and_dict_utils import concatenate_variable_bounds
 from msense.core.discipline import Discipline
 from msense.opt.drivers.driver import Driver
 from msense.opt.drivers.factory import create_driver
@@ -43,13 +44,18 @@ class OptProblem(Discipline):
             logger.warn(
                 f"In {self.name}, the objective {self.objective.name} is not scalar (size = {self.objective.size}).")
 
+        # Design variable bounds, as contiguous arrays
+        lb, ub, _ = concatenate_variable_bounds(self.design_vars)
+
         # Normalization can be used only if
         # all design variables have finite bounds
-        self.use_norm = use_norm
-        for var in self.design_vars:
-            if isinf(var.ub) or isneginf(var.lb):
-                self.use_norm = False
-                break
+        self.use_norm = bool(use_norm and isfinite(lb).all()
+                             and isfinite(ub).all())
+
+        # Normalization is skipped if all design variables
+        # are already bounded in [0, 1], since it has no effect
+        if (lb == 0).all() and (ub == 1).all():
+            self.use_norm = False
 
         # Driver
         self.driver = driver
@@ -61,8 +67,12 @@ class OptProblem(Discipline):
         output_vars = [self.objective] + self.constraints
         super().__init__(name, input_vars, output_vars, **cache_options)
 
-        # Optimization history
+        # Scaling of each jacobian column, when normalization is used
+        self._jac_scale = ub - lb
+
+        # Optimization history, and the variables recorded in each entry
         self.history = []
+        self._history_vars = self.input_vars + self.output_vars
 
     def eval(self, design_vec: Dict[str, ndarray]):
         # Deormalize design vector, if needed
@@ -86,14 +96,26 @@ class OptProblem(Discipline):
             self._diff_policy = self.DiffPolicy.ALWAYS
 
         # Compute the objective and constraints jacobian
-        jac = super().differentiate(design_vec)
-
-        # Normalize jacobian, if needed
+        self._update_jacobian(design_vec)
+        if not (self.use_norm or self.max_obj):
+            return self.get_jac()
+
+        # Normalize jacobian and flip the objective gradient sign for maximization, if needed
+        # * Applied to a single copy of the contiguous jacobian array, if it is available
+        if self._jac_arr is not None:
+            if self.use_norm:
+                jac_arr = self._jac_arr * self._jac_scale
+            else:
+                jac_arr = self._jac_arr.copy()
+            if self.max_obj:
+                jac_arr[:self.objective.size] *= -1
+            return array_to_dict_2d(self.input_vars, self.output_vars, jac_arr)
+
+        jac = self.get_jac()
         if self.use_norm:
             jac = normalize_dict_2d(
                 self.input_vars, self.output_vars, jac)
 
-        # Flip jacobian sign for maximization
         if self.max_obj:
             for var in self.design_vars:
                 jac[self.objective.name][var.name] *= -1
@@ -105,13 +127,14 @@ class OptProblem(Discipline):
         Update the optimization problem history.
         Should be called at the end of each major driver/optimizer iteration.
         """
-        entry = {}
-        entry.update(copy_dict_1d(self.input_vars +
-                     self.output_vars, self._values))
+        # The values of each entry are views into a single copied array
+        entry = array_to_dict_1d(self._history_vars, dict_to_array_1d(
+            self._history_vars, self._values))
         self.history.append(entry)
 
-        logger.info(
-            f"{self.name} - Iteration: {self.driver.iter} - Objective: {self._values[self.objective.name][0]}")
+        # Formatted by the logger, only if the message is emitted
+        logger.info("%s - Iteration: %s - Objective: %s",
+                    self.name, self.driver.iter, self._values[self.objective.name][0])
 
     def solve(self, design_vec: Dict[str, ndarray]) -> Dict[str, any]:
         # Reset history
@@ -146,6 +169,9 @@ class OptProblem(Discipline):
         if not self.history:
             return
 
+        # Imported here, since it is slow to import and only needed for plotting
+        import matplotlib.pyplot as plt
+
         # Create the plot
         fig, ax = plt.subplots(1, 1)
         ax.plot([i for i in range(len(self.history))],
@@ -14,18 +14,20 @@ class SolverType(str, Enum):
     NEWTON_RAPHSON = "newton_raphson"
 
 
+# The solver class of each solver type
+_SOLVER_REGISTRY = {SolverType.NONLINEAR_GS: NonlinearGS,
+                    SolverType.NONLINEAR_JACOBI: NonlinearJacobi,
+                    SolverType.NEWTON_RAPHSON: NewtonRaphson}
+
+
 def create_solver(disciplines: List[Discipline], type: SolverType = SolverType.NONLINEAR_GS,
-                  n_iter_max: int = 15, relax_fact: float = 1.0, tol: float = 0.0001, name: str = None) -> Solver:
+                  n_iter_max: int = 15, relax_fact: float = 1.0, tol: float = 0.0001, name: str = None,
+                  parallel: bool = False, aitken: bool = False) -> Solver:
 
     kwargs = {"disciplines": disciplines, "n_iter_max": n_iter_max,
-              "relax_fact": relax_fact, "tol": tol}
+              "relax_fact": relax_fact, "tol": tol, "parallel": parallel, "aitken": aitken}
     kwargs["name"] = name if name is not None else type
 
     type = SolverType(type)
 
-    if type == SolverType.NONLINEAR_GS:
-        return NonlinearGS(**kwargs)
-    if type == SolverType.NONLINEAR_JACOBI:
-        return NonlinearJacobi(**kwargs)
-    if type == SolverType.NEWTON_RAPHSON:
-        return NewtonRaphson(**kwargs)
+    return _SOLVER_REGISTRY[type](**kwargs)
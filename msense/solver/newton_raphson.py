@@ -1,10 +1,16 @@
+import logging
+
+from numpy import empty, full, nan
 from scipy.sparse import eye
-from scipy.sparse.linalg import spsolve
+from scipy.sparse.linalg import splu
 
-from msense.utils.array_and_dict_utils import array_to_dict_1d, dict_to_array_1d
+from msense.core.constants import FLOAT_DTYPE
+from msense.utils.array_and_dict_utils import get_variable_list_size, get_variable_list_slices
 from msense.jacobians.jacobian_assembler import JacobianAssembler
 from msense.solver.solver import Solver
 
+logger = logging.getLogger(__name__)
+
 
 class NewtonRaphson(Solver):
     """
@@ -20,6 +26,14 @@ class NewtonRaphson(Solver):
         super().__init__(**kwargs)
         self.assembler = JacobianAssembler()
 
+        # Slices of the coupling variables in contiguous arrays
+        self._coupling_slices = get_variable_list_slices(self.coupling_vars)
+
+        # Buffers for the old and output coupling values, filled in-place
+        n_coupling = get_variable_list_size(self.coupling_vars)
+        self._old_buf = empty(n_coupling, FLOAT_DTYPE)
+        self._out_buf = empty(n_coupling, FLOAT_DTYPE)
+
     def _single_iteration(self) -> None:
         # Evaluate and differentiate the disciplines
         outputs, partials = {}, {}
@@ -28,16 +42,25 @@ class NewtonRaphson(Solver):
             partials.update(disc.differentiate(self._old_values))
 
         # Compute correction
-        R = {}
-        for var in self.coupling_vars:
-            R[var.name] = self._old_values[var.name] - outputs[var.name]
-        R = dict_to_array_1d(self.coupling_vars, R)
+        # * The residual is computed with a single operation on the contiguous values
+        for name, sl in self._coupling_slices:
+            self._old_buf[sl] = self._old_values[name]
+            self._out_buf[sl] = outputs[name]
+        R = self._old_buf - self._out_buf
+        # * dRdy is assembled directly in CSC format, as required by SuperLU
+        # * If dRdy is singular, the correction is nan, as with spsolve,
+        # and the solver does not converge
         dRdy = self.assembler.assemble_partial(
-            self.coupling_vars, self.coupling_vars, partials, True)
-        corr = spsolve(dRdy.tocsr(), -R)
-        corr = array_to_dict_1d(self.coupling_vars, corr)
+            self.coupling_vars, self.coupling_vars, partials, True, "csc")
+        try:
+            corr = splu(dRdy).solve(-R)
+        except RuntimeError as e:
+            logger.warning(f"{self.name}: {e}")
+            corr = full(R.size, nan, FLOAT_DTYPE)
 
         # Update values
-        for var in self.coupling_vars:
-            self._values[var.name] = self._old_values[var.name] + \
-                corr[var.name]
+        # * The new values are views of a single array,
+        # which is not modified by the next iterations
+        new_values = self._old_buf + corr
+        for name, sl in self._coupling_slices:
+            self._values[name] = new_values[sl]
@@ -1,3 +1,6 @@
+from typing import List
+
+from msense.core.discipline import Discipline
 from msense.solver.solver import Solver
 
 
@@ -14,16 +17,33 @@ class NonlinearGS(Solver):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
+        # Group consecutive disciplines that do not depend on each other,
+        # so that each group can be evaluated concurrently
+        self._groups: List[List[Discipline]] = []
+        group_outputs = set()
+        for disc in self.disciplines:
+            if not self._groups or any(var.name in group_outputs for var in disc.input_vars):
+                self._groups.append([])
+                group_outputs = set()
+            self._groups[-1].append(disc)
+            group_outputs.update(var.name for var in disc.output_vars)
+
+        # Names of the inputs of each discipline
+        self._disc_input_names = {disc: frozenset([var.name for var in disc.input_vars])
+                                  for disc in self.disciplines}
+
     def _single_iteration(self):
         outputs = {}
-        for disc in self.disciplines:
-            inputs = {}
-            for var in disc.input_vars:
-                if var.name in outputs:
-                    inputs[var.name] = outputs[var.name]
-                elif var.name in self._old_values:
-                    inputs[var.name] = self._old_values[var.name]
-            outputs.update(disc.eval(inputs))
-
-        for var in self.coupling_vars:
-            self._values[var.name] = outputs[var.name]
+        for group in self._groups:
+            group_inputs = []
+            for disc in group:
+                # The latest outputs take precedence over the old values
+                names = self._disc_input_names[disc]
+                inputs = {name: self._old_values[name]
+                          for name in names & self._old_values.keys()}
+                inputs.update({name: outputs[name]
+                               for name in names & outputs.keys()})
+                group_inputs.append(inputs)
+            outputs.update(self._eval_disciplines(group, group_inputs))
+
+        self._values = {name: outputs[name] for name in self._coupling_names}
@@ -15,9 +15,7 @@ class NonlinearJacobi(Solver):
         super().__init__(**kwargs)
 
     def _single_iteration(self) -> None:
-        outputs = {}
-        for disc in self.disciplines:
-            outputs.update(disc.eval(self._old_values))
+        outputs = self._eval_disciplines(
+            self.disciplines, [self._old_values] * len(self.disciplines))
 
-        for var in self.coupling_vars:
-            self._values[var.name] = outputs[var.name]
+        self._values = {name: outputs[name] for name in self._coupling_names}
@@ -1,14 +1,14 @@
 from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from abc import ABC, abstractmethod
 import logging
 
-from numpy import ndarray, zeros
-from numpy.linalg import norm
-import matplotlib.pyplot as plt
+from numpy import ndarray, zeros, add, sqrt, dot, clip
 
 from msense.core.constants import FLOAT_DTYPE
-from msense.utils.array_and_dict_utils import verify_dict_1d
+from msense.utils.array_and_dict_utils import verify_dict_1d, dict_to_array_1d
+from msense.utils.array_and_dict_utils import get_variable_list_offsets
 from msense.core.discipline import Discipline
 from msense.utils.graph_utils import get_couplings
 
@@ -25,7 +25,7 @@ class Solver(ABC):
         CONVERGED = True
 
     def __init__(self, name: str, disciplines: List[Discipline], n_iter_max: int = 15,
-                 relax_fact: float = 1.0, tol: float = 0.0001) -> None:
+                 relax_fact: float = 1.0, tol: float = 0.0001, parallel: bool = False, aitken: bool = False) -> None:
         """
         Initialize the solver.
 
@@ -35,15 +35,24 @@ class Solver(ABC):
             n_iter_max (int, optional): Maximum solver iterations. Defaults to 15.
             relax_fact (float, optional): Solver relaxation factor. Defaults to 0.9.
             tol (float, optional): Residual tolerance. Defaults to 0.0001.
+            parallel (bool, optional): Whether to evaluate independent disciplines concurrently, using a thread pool.
+            Only beneficial for disciplines that release the GIL (e.g. NumPy-heavy or external codes). Defaults to False.
+            aitken (bool, optional): Whether to adapt the relaxation factor at each iteration, using Aitken's delta-squared method.
+            The given relaxation factor is used for the first iteration. Defaults to False.
         """
         self.name = name
         self.disciplines = disciplines
         self.n_iter_max = n_iter_max
         self.relax_fact = relax_fact
         self.tol = tol
+        self.aitken = aitken
 
         # Coupling variables
         self.coupling_vars = get_couplings(self.disciplines)
+        self._coupling_names = tuple([var.name for var in self.coupling_vars])
+
+        # Offsets of the coupling variables in contiguous arrays
+        self._coupling_offsets = get_variable_list_offsets(self.coupling_vars)
 
         # History, iteration number and convergence status
         self.history, self.iter = [], 0
@@ -53,23 +62,84 @@ class Solver(ABC):
         self._old_values: Dict[str, ndarray] = {}
         self._values: Dict[str, ndarray] = {}
 
+        # Aitken relaxation factor and update of the previous iteration
+        self._aitken_fact: float = self.relax_fact
+        self._prev_update: ndarray = None
+
+        # Thread pool for the concurrent evaluation of disciplines
+        # * Only exists for the duration of each solve, so that no threads are left behind
+        self.parallel = parallel
+        self._executor: ThreadPoolExecutor = None
+
     @abstractmethod
     def _single_iteration(self):
         """
         Perform a single solver iteration.
-        * self._values should be updated here
+        * self._values should be updated here, with arrays that are not referenced elsewhere,
+        since they may be modified in-place
         * To be implemented by the subclasses.
         """
         ...
 
+    def _eval_disciplines(self, disciplines: List[Discipline],
+                          input_values: List[Dict[str, ndarray]]) -> Dict[str, ndarray]:
+        """
+        Evaluate a group of disciplines that do not depend on each other.
+        * If the solver is parallel, the disciplines are evaluated concurrently.
+
+        Args:
+            disciplines (List[Discipline]): The disciplines to evaluate.
+            input_values (List[Dict[str, ndarray]]): The input values for each discipline.
+
+        Returns:
+            Dict[str, ndarray]: The output values of all disciplines.
+        """
+        outputs = {}
+        if self._executor is None or len(disciplines) == 1:
+            for disc, values in zip(disciplines, input_values):
+                outputs.update(disc.eval(values))
+        else:
+            futures = [self._executor.submit(disc.eval, values)
+                       for disc, values in zip(disciplines, input_values)]
+            for future in futures:
+                outputs.update(future.result())
+        return outputs
+
     def _apply_relaxation(self) -> None:
         """
         Apply under/over relaxation
+        * The new values are updated in-place, since they are produced by the current iteration.
         """
-        for var in self.coupling_vars:
-            new, old = self._values[var.name], self._old_values[var.name]
-            self._values[var.name] = self.relax_fact * \
-                new + (1 - self.relax_fact) * old
+        relax_fact = self.relax_fact
+        if self.aitken:
+            relax_fact = self._update_aitken_factor()
+        if relax_fact == 1.0:
+            return
+
+        for name in self._coupling_names:
+            new = self._values[name]
+            new *= relax_fact
+            new += (1 - relax_fact) * self._old_values[name]
+
+    def _update_aitken_factor(self) -> float:
+        """
+        Update the relaxation factor using Aitken's delta-squared method:
+
+        w^k = -w^(k-1) * (dY^(k-1) . (dY^k - dY^(k-1))) / |dY^k - dY^(k-1)|^2,
+
+        where dY^k is the unrelaxed update of the coupling values at the k-th iteration.
+        * The factor is clipped to [0.1, 2.0].
+        """
+        update = dict_to_array_1d(self.coupling_vars, self._values) - \
+            dict_to_array_1d(self.coupling_vars, self._old_values)
+        if self._prev_update is not None:
+            update_diff = update - self._prev_update
+            denom = dot(update_diff, update_diff)
+            if denom > 0.0:
+                self._aitken_fact = float(clip(-self._aitken_fact * dot(self._prev_update, update_diff) / denom,
+                                               0.1, 2.0))
+        self._prev_update = update
+        return self._aitken_fact
 
     def _initialize_values(self, initial_coupling_values: Dict[str, ndarray]) -> None:
         """ Initialize the coupling variables values. 
@@ -106,13 +176,14 @@ class Solver(ABC):
         Update residual metric history and convergence status
         """
         # Total residual metric
+        # * The residual norms of all coupling variables are computed at once,
+        # using the concatenated values
         metric = 0.0
-
-        # Compute the residual for each coupling variable
-        for var in self.coupling_vars:
-            new, old = self._values[var.name], self._old_values[var.name]
-            r = new - old
-            metric += norm(r) / (1 + norm(new))
+        if self.coupling_vars:
+            new = dict_to_array_1d(self.coupling_vars, self._values)
+            r = new - dict_to_array_1d(self.coupling_vars, self._old_values)
+            metric = float((sqrt(add.reduceat(r * r, self._coupling_offsets)) /
+                            (1 + sqrt(add.reduceat(new * new, self._coupling_offsets)))).sum())
         self.history.append(metric)
 
         # Check for convergence
@@ -120,8 +191,9 @@ class Solver(ABC):
             self.status = self.SolverStatus.CONVERGED
 
         # Print iteration info
-        logger.info(
-            f"{self.name} - Iteration: {self.iter} - Residual: {metric}")
+        # * Formatted by the logger, only if the message is emitted
+        logger.info("%s - Iteration: %s - Residual: %s",
+                    self.name, self.iter, metric)
 
     def solve(self, initial_coupling_values: Dict[str, ndarray] = None) -> Dict[str, ndarray]:
         """
@@ -132,9 +204,24 @@ class Solver(ABC):
         Returns:
             Dict[str, ndarray]: The coupling variables values produced by the solver.
         """
+        if not self.parallel or len(self.disciplines) < 2:
+            return self._solve(initial_coupling_values)
+
+        with ThreadPoolExecutor(max_workers=len(self.disciplines)) as executor:
+            self._executor = executor
+            try:
+                return self._solve(initial_coupling_values)
+            finally:
+                self._executor = None
+
+    def _solve(self, initial_coupling_values: Dict[str, ndarray] = None) -> Dict[str, ndarray]:
+        """
+        Perform the solver iterations, see solve().
+        """
         # Reset the solver
         self.history, self.iter = [], 0
         self.status = self.SolverStatus.NOT_CONVERGED
+        self._aitken_fact, self._prev_update = self.relax_fact, None
         self._initialize_values(initial_coupling_values)
         self._update_history()
 
@@ -179,6 +266,9 @@ class Solver(ABC):
         if not self.history:
             return
 
+        # Imported here, since it is slow to import and only needed for plotting
+        import matplotlib.pyplot as plt
+
         # Create the plot
         fig, ax = plt.subplots(1, 1)
         ax.semilogy([i for i in range(len(self.history))],
@@ -1,6 +1,7 @@
 from typing import Dict, List, Tuple
+from functools import lru_cache
 
-from numpy import zeros, ndarray
+from numpy import zeros, empty, ndarray, cumsum, add, sqrt, concatenate, vdot
 from numpy import atleast_1d, atleast_2d
 from numpy.linalg import norm
 
@@ -15,24 +16,38 @@ def get_variable_list_size(vars: List[Variable]) -> int:
     return size
 
 
-def concatenate_variable_bounds(vars: List[Variable], use_normalization: bool = False) -> Tuple[ndarray, ndarray, ndarray]:
+def get_variable_list_offsets(vars: List[Variable]) -> ndarray:
     """
-    Get the bounds of a list of variables as a contiguous array.
+    Get the offset of each variable, when the values of
+    a list of variables are stored in a contiguous array.
     """
-    n_vars = get_variable_list_size(vars)
-    lb_arr = zeros(n_vars, FLOAT_DTYPE)
-    ub_arr = zeros(n_vars, FLOAT_DTYPE)
-    keep_feasible_arr = zeros(n_vars, bool)
+    offsets = zeros(len(vars), int)
+    offsets[1:] = cumsum([var.size for var in vars])[:-1]
+    return offsets
 
-    idx = 0
+
+def get_variable_list_slices(vars: List[Variable]) -> List[Tuple[str, slice]]:
+    """
+    Get the name and slice of each variable, when the values of
+    a list of variables are stored in a contiguous array.
+    """
+    slices, idx = [], 0
     for var in vars:
-        lb, ub, keep_feasible = var.get_bounds_as_array(use_normalization)
-        lb_arr[idx: idx + var.size] = lb
-        ub_arr[idx: idx + var.size] = ub
-        keep_feasible_arr[idx: idx + var.size] = keep_feasible
+        slices.append((var.name, slice(idx, idx + var.size)))
         idx += var.size
+    return slices
 
-    return lb_arr, ub_arr, keep_feasible_arr
+
+def concatenate_variable_bounds(vars: List[Variable], use_normalization: bool = False) -> Tuple[ndarray, ndarray, ndarray]:
+    """
+    Get the bounds of a list of variables as a contiguous array.
+    """
+    if not vars:
+        return zeros(0, FLOAT_DTYPE), zeros(0, FLOAT_DTYPE), zeros(0, bool)
+
+    lb, ub, keep_feasible = zip(*[var.get_bounds_as_array(use_normalization)
+                                  for var in vars])
+    return concatenate(lb), concatenate(ub), concatenate(keep_feasible)
 
 
 def verify_dict_1d(vars: List[Variable], values_dict: Dict[str, ndarray], dtype=FLOAT_DTYPE) -> Dict[str, ndarray]:
@@ -61,14 +76,27 @@ def copy_dict_1d(vars: List[Variable], values_dict: Dict[str, ndarray]) -> Dict[
     return copy
 
 
-def dict_to_array_1d(vars: List[Variable], values_dict: Dict[str, ndarray]) -> ndarray:
-    n_vars = sum([var.size for var in vars])
-    values_arr = zeros(n_vars, FLOAT_DTYPE)
-    idx = 0
+def view_dict_1d(vars: List[Variable], values_dict: Dict[str, ndarray]) -> Dict[str, ndarray]:
+    """
+    Same as copy_dict_1d, but the values are read-only views
+    of the original arrays, instead of copies.
+    """
+    view = {}
     for var in vars:
-        values_arr[idx: idx + var.size] = values_dict[var.name]
-        idx += var.size
-    return values_arr
+        if var.name in values_dict:
+            view[var.name] = atleast_1d(values_dict[var.name]).view()
+            view[var.name].flags.writeable = False
+    return view
+
+
+def dict_to_array_1d(vars: List[Variable], values_dict: Dict[str, ndarray]) -> ndarray:
+    """
+    Concatenate the values of a list of variables into a contiguous array.
+    * If the values are already of the float type, only a single copy is made.
+    """
+    if not vars:
+        return empty(0, FLOAT_DTYPE)
+    return concatenate([values_dict[var.name] for var in vars], axis=None).astype(FLOAT_DTYPE, copy=False)
 
 
 def array_to_dict_1d(vars: List[Variable], values_arr: ndarray) -> Dict[str, ndarray]:
@@ -80,20 +108,59 @@ def array_to_dict_1d(vars: List[Variable], values_arr: ndarray) -> Dict[str, nda
     return values_dict
 
 
-def normalize_dict_1d(vars: List[Variable], values_dict: Dict[str, ndarray]) -> Dict[str, ndarray]:
+@lru_cache(maxsize=128)
+def _get_variable_list_scaling(vars: Tuple[Variable]) -> Tuple[ndarray, ndarray]:
+    """
+    Get the lower bounds and the range (ub - lb) of a list of variables as contiguous arrays,
+    so that the values of all variables are (de)normalized with a single operation.
+    * The variables are immutable, so the result is cached. The arrays are shared, and thus read-only.
+    * The cache is bounded, so that variable lists that are no longer used are eventually released.
+    """
+    n_vars = get_variable_list_size(vars)
+    lb_arr = empty(n_vars, FLOAT_DTYPE)
+    range_arr = empty(n_vars, FLOAT_DTYPE)
+
+    idx = 0
     for var in vars:
-        values_dict[var.name] = var.norm_values(values_dict[var.name])
+        lb_arr[idx: idx + var.size] = var.lb
+        range_arr[idx: idx + var.size] = var.ub - var.lb
+        idx += var.size
+
+    lb_arr.flags.writeable = False
+    range_arr.flags.writeable = False
+    return lb_arr, range_arr
+
+
+def normalize_dict_1d(vars: List[Variable], values_dict: Dict[str, ndarray]) -> Dict[str, ndarray]:
+    """
+    Normalize the values of a list of variables, with a single affine transform
+    of a concatenated copy. The entries are replaced by views into the result.
+    """
+    lb, scale = _get_variable_list_scaling(tuple(vars))
+    values_arr = dict_to_array_1d(vars, values_dict)
+    values_arr -= lb
+    values_arr /= scale
+    values_dict.update(array_to_dict_1d(vars, values_arr))
     return values_dict
 
 
 def denormalize_dict_1d(vars: List[Variable], values_dict: Dict[str, ndarray]) -> Dict[str, ndarray]:
-    for var in vars:
-        values_dict[var.name] = var.denorm_values(values_dict[var.name])
+    lb, scale = _get_variable_list_scaling(tuple(vars))
+    values_arr = dict_to_array_1d(vars, values_dict)
+    values_arr *= scale
+    values_arr += lb
+    values_dict.update(array_to_dict_1d(vars, values_arr))
     return values_dict
 
 
 def verify_dict_2d(input_vars: List[Variable], output_vars: List[Variable],
                    values_dict: Dict[str, Dict[str, ndarray]], dtype=FLOAT_DTYPE) -> Dict[str, Dict[str, ndarray]]:
+    """
+    Check that entries with correct shape and dtype exist for all (output, input) pairs
+    in values_dict. Each entry is a 2d-numpy array.
+    * Unlike verify_dict_1d, entries that already have the correct dtype are not copied,
+    since the jacobian is always copied into a contiguous array after verification.
+    """
     for out_var in output_vars:
         if out_var.name not in values_dict:
             raise TypeError(
@@ -103,7 +170,7 @@ def verify_dict_2d(input_vars: List[Variable], output_vars: List[Variable],
                 raise TypeError(
                     f"For output Variable {out_var.name}, missing entry for input Variable {in_var.name}.")
             values_dict[out_var.name][in_var.name] = atleast_2d(
-                values_dict[out_var.name][in_var.name]).astype(dtype)
+                values_dict[out_var.name][in_var.name]).astype(dtype, copy=False)
             if values_dict[out_var.name][in_var.name].shape != (out_var.size, in_var.size):
                 raise ValueError(
                     f"Wrong size ({values_dict[out_var.name][in_var.name].shape}) for entry ({out_var.name}, {in_var.name}) with size {(out_var.size, in_var.size)}.")
@@ -123,11 +190,29 @@ def copy_dict_2d(input_vars: List[Variable], output_vars: List[Variable],
     return copy
 
 
+def view_dict_2d(input_vars: List[Variable], output_vars: List[Variable],
+                 values_dict: Dict[str, ndarray]) -> Dict[str, Dict[str, ndarray]]:
+    """
+    Same as copy_dict_2d, but the values are read-only views
+    of the original arrays, instead of copies.
+    """
+    view = {}
+    for out_var in output_vars:
+        if out_var.name in values_dict:
+            view[out_var.name] = {}
+            for in_var in input_vars:
+                if in_var.name in values_dict[out_var.name]:
+                    view[out_var.name][in_var.name] = atleast_2d(
+                        values_dict[out_var.name][in_var.name]).view()
+                    view[out_var.name][in_var.name].flags.writeable = False
+    return view
+
+
 def dict_to_array_2d(input_vars: List[Variable], output_vars: List[Variable],
                      values_dict: Dict[str, Dict[str, ndarray]], flatten: bool = False) -> ndarray:
     n_in_vars = sum([var.size for var in input_vars])
     n_out_vars = sum([var.size for var in output_vars])
-    values_arr = zeros((n_out_vars, n_in_vars), FLOAT_DTYPE)
+    values_arr = empty((n_out_vars, n_in_vars), FLOAT_DTYPE)
     row_idx = 0
     for out_var in output_vars:
         col_idx = 0
@@ -156,19 +241,21 @@ def array_to_dict_2d(input_vars: List[Variable], output_vars: List[Variable], va
 
 
 def normalize_dict_2d(input_vars: List[Variable], output_vars: List[Variable], values_dict: Dict[str, Dict[str, ndarray]]):
-    for out_var in output_vars:
-        for in_var in input_vars:
-            values_dict[out_var.name][in_var.name] = in_var.norm_grad(
-                values_dict[out_var.name][in_var.name])
+    _, scale = _get_variable_list_scaling(tuple(input_vars))
+    values_arr = dict_to_array_2d(input_vars, output_vars, values_dict)
+    values_arr *= scale
+    for out_var_name, out_values in array_to_dict_2d(input_vars, output_vars, values_arr).items():
+        values_dict[out_var_name].update(out_values)
     return values_dict
 
 
 def denormalize_dict_2d(input_vars: List[Variable], output_vars: List[Variable],
                         values_dict: Dict[str, Dict[str, ndarray]]):
-    for out_var in output_vars:
-        for in_var in input_vars:
-            values_dict[out_var.name][in_var.name] = in_var.denorm_grad(
-                values_dict[out_var.name][in_var.name])
+    _, scale = _get_variable_list_scaling(tuple(input_vars))
+    values_arr = dict_to_array_2d(input_vars, output_vars, values_dict)
+    values_arr /= scale
+    for out_var_name, out_values in array_to_dict_2d(input_vars, output_vars, values_arr).items():
+        values_dict[out_var_name].update(out_values)
     return values_dict
 
 
@@ -177,10 +264,26 @@ def check_values_match(vars: List[Variable], original: Dict[str, ndarray] = {},
     if not original or not test:
         return False
 
+    # The squared discrepancy is compared against the squared threshold,
+    # to avoid its square root
     for var in vars:
-        err = (norm(original[var.name] - test[var.name]
-                    ) / (1.0 + norm(test[var.name])))
-        if err >= tol:
+        diff = original[var.name] - test[var.name]
+        if vdot(diff, diff).real >= (tol * (1.0 + norm(test[var.name])))**2:
             return False
 
     return True
+
+
+def check_arrays_match(offsets: ndarray, original: ndarray, test: ndarray, tol: float = 1e-9):
+    """
+    Same as check_values_match, for values stored in contiguous arrays.
+    The relative error of each variable is computed in a single pass,
+    using the variable offsets in the arrays.
+    * If original is 2d, each row is compared against test,
+    and an array with the result for each row is returned.
+    * The squared discrepancies are compared against the squared thresholds,
+    so that a square root is only taken for the test values.
+    """
+    err_sq = add.reduceat(abs(original - test)**2, offsets, axis=-1)
+    threshold = tol * (1.0 + sqrt(add.reduceat(abs(test)**2, offsets)))
+    return (err_sq < threshold * threshold).all(axis=-1)
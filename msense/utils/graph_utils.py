@@ -14,15 +14,17 @@ def get_couplings(disciplines: List[Discipline]) -> List[Variable]:
     Returns:
         List[Variable]: The coupling variables
     """
-    input_vars, output_vars = [], []
+    # Sets are used for constant time membership checks
+    input_vars, output_vars = set(), []
     for disc in disciplines:
-        input_vars += (disc.input_vars)
+        input_vars.update(disc.input_vars)
         output_vars += (disc.output_vars)
 
-    coupling_vars = []
+    coupling_vars, found = [], set()
     for out_var in output_vars:
-        if out_var in input_vars and out_var not in coupling_vars:
+        if out_var in input_vars and out_var not in found:
             coupling_vars.append(out_var)
+            found.add(out_var)
 
     return coupling_vars
 
@@ -34,11 +36,12 @@ def separate_local_global(vars: List[Variable], disciplines: List[Discipline]) -
     """
 
     # Map each variable to one or more disciplines
+    disc_inputs = [set(disc.input_vars) for disc in disciplines]
     var_to_disc = {}
     for var in vars:
         var_to_disc[var] = []
-        for disc in disciplines:
-            if var in disc.input_vars:
+        for disc, inputs in zip(disciplines, disc_inputs):
+            if var in inputs:
                 var_to_disc[var].append(disc)
 
     # Store the local variables for each discipline
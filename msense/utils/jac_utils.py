@@ -1,19 +1,22 @@
 from typing import List, Dict, Callable
+from concurrent.futures import Executor
 
-from numpy import ndarray, imag, zeros
+from numpy import ndarray, imag, zeros, tile, atleast_1d, concatenate, arange
 
 from msense.core.constants import FLOAT_DTYPE, COMPLEX_DTYPE
 from msense.core.variable import Variable
+from msense.utils.array_and_dict_utils import get_variable_list_size, array_to_dict_2d
 
 
 def initialize_dense_jac(dinput_vars: List[Variable], doutput_vars: List[Variable]):
-    jac = {}
-    for out_var in doutput_vars:
-        jac[out_var.name] = {}
-        for in_var in dinput_vars:
-            jac[out_var.name][in_var.name] = zeros(
-                (out_var.size, in_var.size), dtype=FLOAT_DTYPE)
-    return jac
+    """
+    Initialize a dense jacobian with zeros.
+    * All blocks are views into a single contiguous (n_outputs, n_inputs) array,
+    so that only one allocation is performed.
+    """
+    jac_arr = zeros((get_variable_list_size(doutput_vars),
+                     get_variable_list_size(dinput_vars)), dtype=FLOAT_DTYPE)
+    return array_to_dict_2d(dinput_vars, doutput_vars, jac_arr)
 
 
 def finite_difference_approx(func: Callable[[Dict[str, ndarray]], Dict[str, ndarray]],
@@ -31,26 +34,139 @@ def finite_difference_approx(func: Callable[[Dict[str, ndarray]], Dict[str, ndar
     if jac is None:
         jac = initialize_dense_jac(dinput_vars, doutput_vars)
 
+    # The jacobian columns are computed in a contiguous array,
+    # using the concatenated output values
+    output_vec = _concatenate_values(doutput_vars, output_values)
+    jac_arr = zeros((output_vec.size, get_variable_list_size(dinput_vars)), FLOAT_DTYPE)
+
     # Loop over the input variables
+    col_idx = 0
     for in_var in dinput_vars:
+        # Compute the perturbations
+        # * The values of the variable are perturbed in-place, and restored after each evaluation
+        values = input_values[in_var.name]
+        base = values.copy()
+        dx = eps * (1 + abs(base))
         for i in range(in_var.size):
-            # Compute the perturbation
-            dx = eps * (1 + abs(input_values[in_var.name][i]))
-
             # Perturb the input variable
-            copy = input_values[in_var.name][i]
-            input_values[in_var.name][i] += dx
+            values[i] += dx[i]
 
             # Evaluate the function with the perturbed input values
             output_values_p = func(input_values)
 
-            # Compute the jacobian entry
-            for out_var in doutput_vars:
-                jac[out_var.name][in_var.name][:, i] = (
-                    output_values_p[out_var.name] - output_values[out_var.name]) / dx
+            # Compute the jacobian column
+            jac_arr[:, col_idx] = (_concatenate_values(
+                doutput_vars, output_values_p) - output_vec) / dx[i]
+            col_idx += 1
 
             # Reset the perturbed value
-            input_values[in_var.name][i] = copy
+            values[i] = base[i]
+
+    # Copy the columns to the jacobian blocks
+    _copy_to_jac_blocks(dinput_vars, doutput_vars, jac_arr, jac)
+
+    return jac
+
+
+def finite_difference_approx_parallel(func: Callable[[Dict[str, ndarray]], Dict[str, ndarray]],
+                                      dinput_vars: List[Variable], doutput_vars: List[Variable],
+                                      input_values: Dict[str, ndarray], output_values: Dict[str, ndarray],
+                                      executor: Executor, jac: Dict[str, Dict[str, ndarray]] = None,
+                                      eps=1e-6) -> Dict[str, Dict[str, ndarray]]:
+    """
+    Compute the jacobian of func using Finite-Differences.
+    * Each perturbation is evaluated as a separate task of the executor,
+    thus func must be safe to call concurrently.
+    """
+    # Initialize the jacobian, if one is not provided
+    if jac is None:
+        jac = initialize_dense_jac(dinput_vars, doutput_vars)
+
+    # Submit the evaluation of each perturbed input component
+    futures, steps = [], []
+    for in_var in dinput_vars:
+        dx = eps * (1 + abs(input_values[in_var.name]))
+        for i in range(in_var.size):
+            perturbed_values = {name: value.copy()
+                                for name, value in input_values.items()}
+            perturbed_values[in_var.name][i] += dx[i]
+            futures.append(executor.submit(func, perturbed_values))
+            steps.append(dx[i])
+
+    # Compute the jacobian columns, as the evaluations complete
+    output_vec = _concatenate_values(doutput_vars, output_values)
+    jac_arr = zeros((output_vec.size, len(futures)), FLOAT_DTYPE)
+    for col_idx, (future, dx) in enumerate(zip(futures, steps)):
+        jac_arr[:, col_idx] = (_concatenate_values(
+            doutput_vars, future.result()) - output_vec) / dx
+
+    # Copy the columns to the jacobian blocks
+    _copy_to_jac_blocks(dinput_vars, doutput_vars, jac_arr, jac)
+
+    return jac
+
+
+def _copy_to_jac_blocks(dinput_vars: List[Variable], doutput_vars: List[Variable],
+                        jac_arr: ndarray, jac: Dict[str, Dict[str, ndarray]]) -> None:
+    """
+    Copy a dense jacobian array to the blocks of a jacobian dictionary.
+    """
+    jac_blocks = array_to_dict_2d(dinput_vars, doutput_vars, jac_arr)
+    for out_var in doutput_vars:
+        for in_var in dinput_vars:
+            jac[out_var.name][in_var.name][:, :] = jac_blocks[out_var.name][in_var.name]
+
+
+def _concatenate_values(vars: List[Variable], values: Dict[str, ndarray]) -> ndarray:
+    """
+    Concatenate the values of a list of variables into a contiguous array.
+    """
+    return concatenate([atleast_1d(values[var.name]) for var in vars])
+
+
+def _get_perturbation_batch(dinput_vars: List[Variable], input_values: Dict[str, ndarray]) -> Dict[str, ndarray]:
+    """
+    Create a batch of input values, with one sample per component of the differentiated inputs.
+    """
+    n_samples = sum([var.size for var in dinput_vars])
+    return {name: tile(atleast_1d(value), (n_samples, 1)) for name, value in input_values.items()}
+
+
+def finite_difference_approx_batch(func: Callable[[Dict[str, ndarray]], Dict[str, ndarray]],
+                                   dinput_vars: List[Variable], doutput_vars: List[Variable],
+                                   input_values: Dict[str, ndarray], output_values: Dict[str, ndarray],
+                                   jac: Dict[str, Dict[str, ndarray]] = None, eps=1e-6) -> Dict[str, Dict[str, ndarray]]:
+    """
+    Compute the jacobian of func using Finite-Differences.
+    * All perturbations are evaluated with a single call to func, 
+    which takes and returns values with a leading sample axis.
+    """
+    # Initialize the jacobian, if one is not provided
+    if jac is None:
+        jac = initialize_dense_jac(dinput_vars, doutput_vars)
+
+    # Perturb each input component in a separate sample
+    # * The perturbations of each variable lie on a diagonal of its batch values,
+    # and are added at once
+    batch_values = _get_perturbation_batch(dinput_vars, input_values)
+    dx = {}
+    sample_idx = 0
+    for in_var in dinput_vars:
+        dx[in_var.name] = eps * (1 + abs(input_values[in_var.name]))
+        idx = arange(in_var.size)
+        batch_values[in_var.name][sample_idx + idx, idx] += dx[in_var.name]
+        sample_idx += in_var.size
+
+    # Evaluate all perturbed samples at once
+    output_values_p = func(batch_values)
+
+    # Compute the jacobian entries
+    sample_idx = 0
+    for in_var in dinput_vars:
+        for out_var in doutput_vars:
+            jac[out_var.name][in_var.name][:, :] = (
+                output_values_p[out_var.name][sample_idx: sample_idx + in_var.size] - output_values[out_var.name]).T / dx[in_var.name]
+        sample_idx += in_var.size
 
     return jac
 
@@ -61,6 +177,7 @@ def complex_step_approx(func: Callable[[Dict[str, ndarray]], Dict[str, ndarray]]
                         jac: Dict[str, Dict[str, ndarray]], eps=1e-6) -> Dict[str, Dict[str, ndarray]]:
     """
     Compute the jacobian of func using the Complex-Step method
+    * The entries of input_values are replaced by complex copies, the original arrays are not modified.
     """
     # Cast the input values to complex
     for in_var_name in input_values.keys():
@@ -71,23 +188,70 @@ def complex_step_approx(func: Callable[[Dict[str, ndarray]], Dict[str, ndarray]]
     if jac is None:
         jac = initialize_dense_jac(dinput_vars, doutput_vars)
 
+    # The jacobian columns are computed in a contiguous array,
+    # using the concatenated output values
+    jac_arr = zeros((get_variable_list_size(doutput_vars),
+                     get_variable_list_size(dinput_vars)), FLOAT_DTYPE)
+
     # Loop over the input variables
+    col_idx = 0
     for in_var in dinput_vars:
+        values = input_values[in_var.name]
+        base = values.copy()
         for i in range(in_var.size):
 
             # Perturb the input variable
-            copy = input_values[in_var.name][i]
-            input_values[in_var.name][i] += eps * 1j
+            values[i] += eps * 1j
 
             # Evaluate the function with the perturbed input values
             output_values_p = func(input_values)
 
-            # Compute the jacobian entry
-            for out_var in doutput_vars:
-                jac[out_var.name][in_var.name][:, i] = imag(
-                    output_values_p[out_var.name]) / eps
+            # Compute the jacobian column
+            jac_arr[:, col_idx] = imag(_concatenate_values(
+                doutput_vars, output_values_p)) / eps
+            col_idx += 1
 
             # Reset the perturbed value
-            input_values[in_var.name][i] = copy
+            values[i] = base[i]
+
+    # Copy the columns to the jacobian blocks
+    _copy_to_jac_blocks(dinput_vars, doutput_vars, jac_arr, jac)
+
+    return jac
+
+
+def complex_step_approx_batch(func: Callable[[Dict[str, ndarray]], Dict[str, ndarray]],
+                              dinput_vars: List[Variable], doutput_vars: List[Variable],
+                              input_values: Dict[str, ndarray],
+                              jac: Dict[str, Dict[str, ndarray]], eps=1e-6) -> Dict[str, Dict[str, ndarray]]:
+    """
+    Compute the jacobian of func using the Complex-Step method.
+    * All perturbations are evaluated with a single call to func, 
+    which takes and returns values with a leading sample axis.
+    """
+    # If required, initialize jac
+    if jac is None:
+        jac = initialize_dense_jac(dinput_vars, doutput_vars)
+
+    # Perturb each input component in a separate sample
+    batch_values = _get_perturbation_batch(dinput_vars, input_values)
+    for name in batch_values.keys():
+        batch_values[name] = batch_values[name].astype(COMPLEX_DTYPE)
+    sample_idx = 0
+    for in_var in dinput_vars:
+        idx = arange(in_var.size)
+        batch_values[in_var.name][sample_idx + idx, idx] += eps * 1j
+        sample_idx += in_var.size
+
+    # Evaluate all perturbed samples at once
+    output_values_p = func(batch_values)
+
+    # Compute the jacobian entries
+    sample_idx = 0
+    for in_var in dinput_vars:
+        for out_var in doutput_vars:
+            jac[out_var.name][in_var.name][:, :] = imag(
+                output_values_p[out_var.name][sample_idx: sample_idx + in_var.size]).T / eps
+        sample_idx += in_var.size
 
     return jac
@@ -2,28 +2,32 @@ import logging
 
 DEFAULT_LOG_FORMAT = "%(name)s: - %(asctime)s - %(levelname)s - %(message)s"
 
+# The color of each level, shared by all formatters
+_LEVEL_COLORS = {
+    logging.DEBUG: "\x1B[0;34;49m",
+    logging.INFO: "\x1B[0;36;49m",
+    logging.WARNING: "\x1B[0;33;49m",
+    logging.ERROR: "\x1B[0;31;49m",
+    logging.CRITICAL: "\x1B[0;31;49m"}
+_RESET_COLOR = "\x1B[0m"
+
 
 class CustomFormatter(logging.Formatter):
 
     def __init__(self, fmt) -> None:
         super().__init__(fmt)
 
-        blue = "\x1B[0;34;49m"
-        cyan = "\x1B[0;36;49m"
-        yellow = "\x1B[0;33;49m"
-        red = "\x1B[0;31;49m"
-        reset = "\x1B[0m"
+        self.formats = {level: color + fmt + _RESET_COLOR
+                        for level, color in _LEVEL_COLORS.items()}
 
-        self.formats = {
-            logging.DEBUG: blue + fmt + reset,
-            logging.INFO: cyan + fmt + reset,
-            logging.WARNING: yellow + fmt + reset,
-            logging.ERROR: red + fmt + reset,
-            logging.CRITICAL: red + fmt + reset}
+        # The formatter for each level, created once
+        self._formatters = {level: logging.Formatter(log_fmt)
+                            for level, log_fmt in self.formats.items()}
 
     def format(self, record):
-        log_fmt = self.formats[record.levelno]
-        formatter = logging.Formatter(log_fmt)
+        formatter = self._formatters.get(record.levelno)
+        if formatter is None:
+            return super().format(record)
         return formatter.format(record)
 
 